@@ -23,6 +23,17 @@ class UpstoxClient:
         self.authenticator = authenticator
         self.ws = UpstoxWebSocket(authenticator)  # Initialize the WebSocket client
         self.ws_connected = False
+        # Set once the WebSocket feed is connected and authenticated
+        self.ws_connected_event = self.ws.connected_event
+        
+        # Keep-alive session, so requests reuse pooled connections instead of
+        # opening a new TCP/TLS connection each
+        self.session = requests.Session()
+        
+        # Request headers for the access token they were built from; requests check
+        # authentication first, so they are only rebuilt after the token changes
+        self._headers: Dict[str, str] = {}
+        self._headers_token: Optional[str] = None
         
         # Verify authentication
         if not self.authenticator.is_authenticated():
@@ -30,10 +41,20 @@ class UpstoxClient:
     
     def _get_headers(self) -> Dict[str, str]:
         """Get authenticated headers for API requests"""
-        return self.authenticator.get_auth_headers()
-    
-    def _make_request(self, method: str, endpoint: str, params: Dict = None, data: Dict = None) -> Dict:
-        """Make an authenticated request to the Upstox API"""
+        access_token = self.authenticator.access_token
+        if access_token != self._headers_token or not self._headers:
+            self._headers = self.authenticator.get_auth_headers()
+            self._headers_token = access_token
+        return self._headers
+    
+    def _make_request(self, method: str, endpoint: str, params: Dict = None, data: Dict = None,
+                      raw: bool = False) -> Union[Dict, bytes]:
+        """
+        Make an authenticated request to the Upstox API
+        
+        With raw=True a successful response is returned as the undecoded body bytes,
+        so callers can parse it themselves; errors are still returned as dicts.
+        """
         url = f"{self.BASE_URL}/{endpoint}"
         
         try:
@@ -47,18 +68,22 @@ class UpstoxClient:
             logger.debug(f"Making {method} request to {url}")
             
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params)
+                response = self.session.get(url, headers=headers, params=params)
             elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=data)
+                response = self.session.post(url, headers=headers, json=data)
             elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data)
+                response = self.session.put(url, headers=headers, json=data)
             elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers, params=params)
+                response = self.session.delete(url, headers=headers, params=params)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             # Handle API response
             if response.status_code in (200, 201):
+                if raw:
+                    logger.debug(f"API response: {response.status_code}")
+                    return response.content
+                
                 response_data = response.json()
                 logger.debug(f"API response: {response.status_code}")
                 return response_data
@@ -70,7 +95,7 @@ class UpstoxClient:
                     logger.info("Authentication token may have expired, attempting to refresh")
                     if self.authenticator.authenticate():
                         # Retry the request with new token
-                        return self._make_request(method, endpoint, params, data)
+                        return self._make_request(method, endpoint, params, data, raw)
                 return {"status": "error", "message": response.text}
                 
         except Exception as e:
@@ -85,10 +110,10 @@ class UpstoxClient:
         """Get user funds and margins"""
         return self._make_request('GET', 'user/funds-and-margin')
     
-    def get_positions(self) -> Dict:
-        """Get current positions"""
+    def get_positions(self, raw: bool = False) -> Union[Dict, bytes]:
+        """Get current positions (as the raw response body if raw is set)"""
         # Updated endpoint as per Upstox API v2
-        return self._make_request('GET', 'portfolio/short-term-positions')
+        return self._make_request('GET', 'portfolio/short-term-positions', raw=raw)
     
     def get_holdings(self) -> Dict:
         """Get current holdings"""
@@ -187,9 +212,9 @@ class UpstoxClient:
         data = {"order_id": order_id}
         return self._make_request('DELETE', 'order/cancel', data=data)
     
-    def get_order_book(self) -> Dict:
-        """Get the order book"""
-        return self._make_request('GET', 'order/get-orders')
+    def get_order_book(self, raw: bool = False) -> Union[Dict, bytes]:
+        """Get the order book (as the raw response body if raw is set)"""
+        return self._make_request('GET', 'order/get-orders', raw=raw)
     
     def get_trade_book(self) -> Dict:
         """Get the trade book"""
@@ -2,76 +2,137 @@
 Authentication module for Upstox API
 """
 
+import base64
+import hashlib
 import json
 import logging
 import os
+import socket
 import time
-import webbrowser
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
-from typing import Dict, Optional, Callable
+from threading import Lock, Timer
+from typing import TYPE_CHECKING, Any, Dict, Optional, Callable, Tuple
 from urllib.parse import parse_qs, urlparse
 
-import requests
-
 from src.utils.logger import logger
 
-class CallbackHandler(BaseHTTPRequestHandler):
-    """HTTP request handler for OAuth callback"""
+if TYPE_CHECKING:
+    import requests
+
+# Read-through cache of the token file shared by all authenticator instances,
+# stored as (token_data, mtime) so a file rewritten elsewhere is picked up
+_TOKEN_CACHE: Optional[Tuple[Dict[str, Any], float]] = None
+_TOKEN_CACHE_LOCK = Lock()
+
+# Serializes token refreshes across all authenticator instances, since they share
+# the token file and a refresh token can only be spent once
+_REFRESH_LOCK = Lock()
+
+def _read_token_file(token_file: str) -> Dict[str, Any]:
+    """Read the token file, reusing the cached payload if the file is unchanged"""
+    global _TOKEN_CACHE
+    
+    with _TOKEN_CACHE_LOCK:
+        mtime = os.stat(token_file).st_mtime
+        if _TOKEN_CACHE is not None and _TOKEN_CACHE[1] == mtime:
+            return dict(_TOKEN_CACHE[0])
+        
+        with open(token_file, 'r') as f:
+            token_data = json.load(f)
+        
+        _TOKEN_CACHE = (token_data, mtime)
+        return dict(token_data)
+
+class _LocalTime:
+    """Timestamp that is only rendered to local time when a log record is formatted"""
+    
+    __slots__ = ('timestamp',)
+    
+    def __init__(self, timestamp: Optional[float] = None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+    
+    def __str__(self) -> str:
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp))
+
+def _redact(body: str) -> str:
+    """Summarize a token endpoint response body without exposing its contents"""
+    return f"<{len(body)} bytes, sha256:{hashlib.sha256(body.encode()).hexdigest()[:12]}>"
+
+# Shared keep-alive session for the OAuth token endpoint
+OAUTH_TIMEOUT = 10.0
+_OAUTH_SESSION: Optional['requests.Session'] = None
+
+def _oauth_session() -> 'requests.Session':
+    """Return the shared HTTP session used for token exchange and refresh"""
+    global _OAUTH_SESSION
+    
+    if _OAUTH_SESSION is None:
+        # Imported lazily: startup with still-valid saved tokens never needs it
+        import requests
+        _OAUTH_SESSION = requests.Session()
+    
+    return _OAUTH_SESSION
+
+def _write_token_file(token_file: str, token_data: Dict[str, Any]) -> None:
+    """Write the token file and refresh the cache with the written payload"""
+    global _TOKEN_CACHE
+    
+    with _TOKEN_CACHE_LOCK:
+        with open(token_file, 'w') as f:
+            json.dump(token_data, f)
+        
+        # Set permissions to restrict access
+        os.chmod(token_file, 0o600)
+        _TOKEN_CACHE = (dict(token_data), os.stat(token_file).st_mtime)
 
-    def __init__(self, *args, callback_fn=None, **kwargs):
-        self.callback_fn = callback_fn
-        # This is required since BaseHTTPRequestHandler calls __init__ in a different way
-        BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
+def _parse_callback_code(path: str) -> Optional[str]:
+    """Extract the authorization code from the callback request path"""
+    codes = parse_qs(urlparse(path).query).get('code')
+    return codes[0] if codes else None
 
-    def do_GET(self):
-        """Handle GET requests to the callback URL"""
-        # Parse query parameters
-        query_components = urlparse(self.path).query
-        query_params = parse_qs(query_components)
-        
-        # Extract code or error
-        if 'code' in query_params:
-            code = query_params['code'][0]
-            logger.info(f"Authentication code received {code}")
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(b"Authentication successful! You can close this window.")
-            if self.callback_fn:
-                self.callback_fn(code)
-        else:
-            self.send_response(400)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(b"Authentication failed! Please try again.")
-            if self.callback_fn:
-                self.callback_fn(None)
+def _http_response(status: str, body: bytes) -> bytes:
+    """Build a minimal HTTP/1.1 response for the browser"""
+    return (
+        f"HTTP/1.1 {status}\r\nContent-Type: text/html\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    ).encode() + body
 
-def create_callback_handler(callback_fn):
-    """Create a callback handler with the specified callback function"""
-    class CustomHandler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            # Parse query parameters
-            query = parse_qs(urlparse(self.path).query)
+def wait_for_callback(host: str, port: int, timeout: float = 300) -> Optional[str]:
+    """Accept a single OAuth redirect on host:port and return its code, if any"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(1)
+        sock.settimeout(timeout)
+        
+        try:
+            conn, _ = sock.accept()
+        except socket.timeout:
+            return None
+        
+        with conn:
+            conn.settimeout(timeout)
+            
+            # Only the request line is needed, but read up to the end of the headers
+            data = b''
+            while b'\r\n\r\n' not in data and len(data) < 65536:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
             
-            # Extract code or error
-            if 'code' in query:
-                code = query['code'][0]
-                logger.info(f"Authentication code received {code}")
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                self.wfile.write(b"Authentication successful! You can close this window.")
-                callback_fn(code)
+            request_line = data.split(b'\r\n', 1)[0].split(b' ')
+            path = request_line[1].decode('latin-1') if len(request_line) > 1 else ''
+            code = _parse_callback_code(path)
+            
+            if code:
+                logger.info("Authentication code received (len=%d)", len(code))
+                conn.sendall(_http_response("200 OK", b"Authentication successful! You can close this window."))
             else:
-                self.send_response(400)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                self.wfile.write(b"Authentication failed! Please try again.")
-                callback_fn(None)
-    
-    return CustomHandler
+                conn.sendall(_http_response("400 Bad Request", b"Authentication failed! Please try again."))
+            
+            return code
 
 class UpstoxAuthenticator:
     """Handles authentication with Upstox API"""
@@ -80,17 +141,47 @@ class UpstoxAuthenticator:
     AUTH_URL = "https://api.upstox.com/v2/login/authorization/dialog"
     TOKEN_URL = "https://api.upstox.com/v2/login/authorization/token"
     
+    # Refresh this many seconds before the access token expires
+    REFRESH_LEAD_TIME = 300
+    
     def __init__(self, api_key: str, api_secret: str, redirect_uri: str):
         """Initialize authenticator with API credentials"""
         self.api_key = api_key
         self.api_secret = api_secret
         self.redirect_uri = redirect_uri
+        
+        # Validate the redirect URI up front and keep the parsed callback address
+        parsed_uri = urlparse(redirect_uri)
+        if parsed_uri.scheme not in ('http', 'https'):
+            raise ValueError(f"Redirect URI '{redirect_uri}' must use http or https")
+        self._callback_host = parsed_uri.hostname or 'localhost'
+        self._callback_port = parsed_uri.port or 8000
+        self._auth_url = f"{self.AUTH_URL}?client_id={api_key}&redirect_uri={redirect_uri}&response_type=code"
+        
         self.access_token = None
         self.refresh_token = None
         self.token_expiry = 0
         
+        # PKCE (code_verifier, code_challenge) for the OAuth flow in progress
+        self._pkce: Optional[Tuple[str, str]] = None
+        
+        self._last_refresh_at = float("-inf")
+        self._refresh_timer: Optional[Timer] = None
+        
         # Try to load saved tokens
-        self._load_tokens()
+        if self._load_tokens():
+            self._schedule_refresh()
+    
+    @property
+    def token_expiry(self) -> float:
+        """Wall-clock token expiry timestamp, as persisted to the token file"""
+        return self._token_expiry_wall
+    
+    @token_expiry.setter
+    def token_expiry(self, expiry: float) -> None:
+        # Keep a monotonic deadline alongside so expiry checks are immune to clock jumps
+        self._token_expiry_wall = expiry
+        self._token_expiry_mono = time.monotonic() + (expiry - time.time())
     
     def _load_tokens(self) -> bool:
         """Load saved tokens from file if available"""
@@ -98,25 +189,23 @@ class UpstoxAuthenticator:
         
         if os.path.exists(token_file):
             try:
-                with open(token_file, 'r') as f:
-                    token_data = json.load(f)
+                token_data = _read_token_file(token_file)
                 
                 self.access_token = token_data.get('access_token')
                 self.refresh_token = token_data.get('refresh_token')
                 self.token_expiry = token_data.get('expiry', 0)
                 
                 # Check if token is still valid
-                is_valid = self.token_expiry > time.time() + 60
+                is_valid = self._token_expiry_mono > time.monotonic() + 60
                 if is_valid:
                     logger.info("Loaded valid tokens from file")
                 else:
                     logger.info("Loaded tokens are expired")
                     
                 # Debug log token details
-                logger.debug(f"Token details - Access: {self.access_token is not None}, " +
-                            f"Refresh: {self.refresh_token is not None}, " +
-                            f"Expiry: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.token_expiry))}, " +
-                            f"Current: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}")
+                logger.debug("Token details - Access: %s, Refresh: %s, Expiry: %s, Current: %s",
+                             self.access_token is not None, self.refresh_token is not None,
+                             _LocalTime(self.token_expiry), _LocalTime())
                             
                 return is_valid
             except Exception as e:
@@ -124,6 +213,27 @@ class UpstoxAuthenticator:
         
         return False
     
+    def _sync_saved_tokens(self) -> bool:
+        """Adopt tokens saved by another instance if they are newer than ours; return whether adopted"""
+        token_file = os.path.expanduser("~/.upstox_tokens.json")
+        
+        try:
+            token_data = _read_token_file(token_file)
+        except (OSError, ValueError):
+            return False
+        
+        # Tokens issued later expire later, so a later expiry means a newer refresh
+        if token_data.get('expiry', 0) <= self.token_expiry:
+            return False
+        
+        self.access_token = token_data.get('access_token')
+        self.refresh_token = token_data.get('refresh_token')
+        self.token_expiry = token_data.get('expiry', 0)
+        logger.debug("Adopted tokens refreshed by another authenticator")
+        
+        self._schedule_refresh()
+        return True
+    
     def _save_tokens(self) -> None:
         """Save tokens to file for later use"""
         token_file = os.path.expanduser("~/.upstox_tokens.json")
@@ -135,34 +245,31 @@ class UpstoxAuthenticator:
         }
         
         try:
-            with open(token_file, 'w') as f:
-                json.dump(token_data, f)
-            
-            # Set permissions to restrict access
-            os.chmod(token_file, 0o600)
+            _write_token_file(token_file, token_data)
             logger.info("Saved tokens to file")
             
             # Debug log token details after save
-            logger.debug(f"Saved token details - Access: {self.access_token is not None}, " +
-                        f"Refresh: {self.refresh_token is not None}, " +
-                        f"Expiry: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.token_expiry))}, " +
-                        f"Current: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}")
+            logger.debug("Saved token details - Access: %s, Refresh: %s, Expiry: %s, Current: %s",
+                         self.access_token is not None, self.refresh_token is not None,
+                         _LocalTime(self.token_expiry), _LocalTime())
         except Exception as e:
             logger.error(f"Error saving tokens: {e}")
     
     def is_authenticated(self) -> bool:
         """Check if user is authenticated with valid tokens"""
         # Check if we have a token and it's not expired
+        now = time.monotonic()
         is_valid = (
             self.access_token is not None and 
-            self.token_expiry > time.time() + 60
+            self._token_expiry_mono > now + 60
         )
         
-        # Debug log authentication status
-        logger.debug(f"Authentication check: {is_valid} - " +
-                    f"Access: {self.access_token is not None}, " +
-                    f"Expiry: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.token_expiry)) if self.token_expiry else 'None'}, " +
-                    f"Current: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}")
+        # Debug log authentication status; checked on every request, so the timestamp
+        # arguments are only built when the record will be emitted
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Authentication check: %s - Access: %s, Expiry: %s, Current: %s",
+                         is_valid, self.access_token is not None,
+                         _LocalTime(self.token_expiry) if self.token_expiry else 'None', _LocalTime())
         
         return is_valid
     
@@ -185,17 +292,54 @@ class UpstoxAuthenticator:
     
     def _refresh_access_token(self, max_retries=3) -> bool:
         """Refresh the access token using the refresh token"""
+        with _REFRESH_LOCK:
+            # Another thread or instance may have refreshed while we waited for the lock
+            self._sync_saved_tokens()
+            if self.is_authenticated() or time.monotonic() - self._last_refresh_at < 2:
+                logger.debug("Token already refreshed by another caller")
+                return True
+            
+            return self._do_refresh_access_token(max_retries)
+    
+    def _schedule_refresh(self) -> None:
+        """Schedule a background refresh shortly before the access token expires"""
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        
+        if not self.refresh_token:
+            return
+        
+        delay = max(0, self._token_expiry_mono - time.monotonic() - self.REFRESH_LEAD_TIME)
+        self._refresh_timer = Timer(delay, self._proactive_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+        logger.debug("Scheduled token refresh in %.0fs", delay)
+    
+    def _proactive_refresh(self) -> None:
+        """Refresh the access token from the background timer"""
+        with _REFRESH_LOCK:
+            # Skip if a request-path refresh just happened, or another instance refreshed
+            if time.monotonic() - self._last_refresh_at < 2 or self._sync_saved_tokens():
+                return
+            
+            logger.info("Proactively refreshing access token")
+            self._do_refresh_access_token(max_retries=3)
+    
+    def _do_refresh_access_token(self, max_retries: int) -> bool:
+        """Exchange the refresh token for a new access token (caller holds _REFRESH_LOCK)"""
         if not self.refresh_token:
             logger.warning("No refresh token available")
             return False
         
         retries = 0
         while retries < max_retries:
+            spent_refresh_token = self.refresh_token
             try:
                 data = {
                     'client_id': self.api_key,
                     'client_secret': self.api_secret,
-                    'refresh_token': self.refresh_token,
+                    'refresh_token': spent_refresh_token,
                     'grant_type': 'refresh_token'
                 }
                 
@@ -204,38 +348,45 @@ class UpstoxAuthenticator:
                     'Accept': 'application/json'
                 }
                 
-                logger.debug(f"Making refresh token request to {self.TOKEN_URL}")
-                response = requests.post(
+                logger.debug("Making refresh token request to %s", self.TOKEN_URL)
+                response = _oauth_session().post(
                     self.TOKEN_URL, 
                     data=data,
-                    headers=headers
+                    headers=headers,
+                    timeout=OAUTH_TIMEOUT
                 )
                 
                 if response.status_code == 200:
                     token_data = response.json()
-                    self.access_token = token_data.get('access_token')
-                    
-                    # Check if we got a new refresh token too
-                    new_refresh_token = token_data.get('refresh_token')
-                    if new_refresh_token:
-                        self.refresh_token = new_refresh_token
-                    
-                    self.token_expiry = time.time() + token_data.get('expires_in', 0)
-                    
-                    # Save updated tokens
-                    self._save_tokens()
+                    self._commit_tokens(
+                        token_data.get('access_token'),
+                        token_data.get('refresh_token'),
+                        token_data.get('expires_in', 0)
+                    )
+                    self._last_refresh_at = time.monotonic()
                     
                     logger.info("Successfully refreshed access token")
                     return True
                 elif response.status_code == 401:
+                    # The token may have been spent by another instance that saved a newer one;
+                    # never persist a cleared token over it
+                    if self._sync_saved_tokens() and self.refresh_token != spent_refresh_token:
+                        logger.info("Refresh token was rotated by another authenticator")
+                        if self.is_authenticated():
+                            return True
+                        retries += 1
+                        continue
+                    
                     # Invalid refresh token - can't recover
-                    logger.error(f"Refresh token is invalid. Re-authentication required. Response: {response.text}")
+                    logger.error("Refresh token is invalid. Re-authentication required. Response: %s",
+                                 _redact(response.text))
                     self.refresh_token = None
                     self._save_tokens()  # Save cleared tokens
                     return False
                 else:
                     # Temporary error - can retry
-                    logger.warning(f"Failed to refresh token: {response.status_code} - {response.text}. Retry {retries+1}/{max_retries}")
+                    logger.warning("Failed to refresh token: %s - %s. Retry %d/%d",
+                                   response.status_code, _redact(response.text), retries + 1, max_retries)
                     retries += 1
                     time.sleep(1)  # Wait before retrying
             except Exception as e:
@@ -247,46 +398,59 @@ class UpstoxAuthenticator:
         logger.error(f"Failed to refresh token after {max_retries} attempts")
         return False
     
+    def _pkce_pair(self) -> Tuple[str, str]:
+        """Return the PKCE verifier and S256 challenge, generated once per flow"""
+        if self._pkce is None:
+            verifier = base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode()
+            challenge = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest()).rstrip(b'=').decode()
+            self._pkce = (verifier, challenge)
+        
+        return self._pkce
+    
     def _oauth_flow(self) -> bool:
         """Initiate OAuth authentication flow"""
-        # Generate auth URL with required parameters
-        auth_url = f"{self.AUTH_URL}?client_id={self.api_key}&redirect_uri={self.redirect_uri}&response_type=code"
+        import webbrowser
         
-        # Open browser for user to authenticate
-        webbrowser.open(auth_url)
+        _, challenge = self._pkce_pair()
         
-        # Create a server to listen for the callback
-        code = [None]  # Use a list to store the code (mutable)
-        
-        def callback_fn(auth_code):
-            code[0] = auth_code
+        # Open browser for user to authenticate
+        webbrowser.open(f"{self._auth_url}&code_challenge={challenge}&code_challenge_method=S256")
         
-        # Start a local server to receive the callback
-        handler = create_callback_handler(callback_fn)
+        logger.info("Waiting for authentication at %s", self.redirect_uri)
         
-        # Parse the redirect_uri to get the port
-        parsed_uri = urlparse(self.redirect_uri)
-        host = parsed_uri.hostname or 'localhost'
-        port = parsed_uri.port or 8000
+        # Serve the single redirect from the browser on the callback address
+        try:
+            code = wait_for_callback(self._callback_host, self._callback_port, timeout=300)
+        except OSError as e:
+            logger.error(f"Error receiving authentication callback: {e}")
+            code = None
         
-        server = HTTPServer((host, port), handler)
+        try:
+            # If we got a code, exchange it for tokens
+            if code:
+                return self._exchange_code_for_token(code)
+            else:
+                logger.error("Authentication failed or timed out")
+                return False
+        finally:
+            # The verifier is single-use; the next flow gets a fresh pair
+            self._pkce = None
+    
+    def _commit_tokens(self, access_token: Optional[str], refresh_token: Optional[str], expires_in: float) -> bool:
+        """Store, persist and schedule refresh of newly issued tokens; return whether they are usable"""
+        self.access_token = access_token
         
-        # Run server in a separate thread
-        server_thread = Thread(target=server.handle_request)
-        server_thread.daemon = True
-        server_thread.start()
+        # Keep the current refresh token unless a new one was issued
+        if refresh_token:
+            self.refresh_token = refresh_token
         
-        logger.info(f"Waiting for authentication at {self.redirect_uri}")
+        self.token_expiry = time.time() + expires_in
+        logger.debug("Token will expire at %s, expires_in=%s", _LocalTime(self.token_expiry), expires_in)
         
-        # Wait for the callback to complete
-        server_thread.join(timeout=300)
+        self._save_tokens()
+        self._schedule_refresh()
         
-        # If we got a code, exchange it for tokens
-        if code[0]:
-            return self._exchange_code_for_token(code[0])
-        else:
-            logger.error("Authentication failed or timed out")
-            return False
+        return self.access_token is not None and expires_in > 60
     
     def _exchange_code_for_token(self, code: str) -> bool:
         """Exchange authorization code for access and refresh tokens"""
@@ -298,48 +462,40 @@ class UpstoxAuthenticator:
                 'redirect_uri': self.redirect_uri,
                 'grant_type': 'authorization_code'
             }
+            if self._pkce is not None:
+                data['code_verifier'] = self._pkce[0]
             
             headers = {
                 'Content-Type': 'application/x-www-form-urlencoded',
                 'Accept': 'application/json'
             }
             
-            logger.debug(f"Exchanging code for token at {self.TOKEN_URL}")
-            response = requests.post(
+            logger.debug("Exchanging code for token at %s", self.TOKEN_URL)
+            response = _oauth_session().post(
                 self.TOKEN_URL,
                 data=data,
-                headers=headers
+                headers=headers,
+                timeout=OAUTH_TIMEOUT
             )
             
             if response.status_code == 200:
                 token_data = response.json()
                 
                 # Log token details (without exposing the actual token)
-                logger.debug(f"Token response keys: {token_data.keys()}")
-                
-                self.access_token = token_data.get('access_token')
-                self.refresh_token = token_data.get('refresh_token')
+                logger.debug("Token response keys: %s", token_data.keys())
                 
                 # Check if expires_in was provided, default to 1 day (86400 seconds) if not
-                expires_in = token_data.get('expires_in', 86400)
-                self.token_expiry = time.time() + expires_in
-                
-                # Log the expiry time
-                expiry_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.token_expiry))
-                logger.debug(f"Token will expire at {expiry_time}, expires_in={expires_in}")
-                
-                # Save tokens
-                self._save_tokens()
-                
-                logger.info("Successfully obtained access token")
+                auth_status = self._commit_tokens(
+                    token_data.get('access_token'),
+                    token_data.get('refresh_token'),
+                    token_data.get('expires_in', 86400)
+                )
                 
-                # Verify token was properly saved
-                auth_status = self.is_authenticated()
-                logger.info(f"Post-exchange authentication status: {auth_status}")
+                logger.info("Successfully obtained access token (authenticated: %s)", auth_status)
                 
                 return True
             else:
-                logger.error(f"Failed to obtain token: {response.status_code} - {response.text}")
+                logger.error("Failed to obtain token: %s - %s", response.status_code, _redact(response.text))
                 return False
         except Exception as e:
             logger.error(f"Error exchanging code for token: {e}")
@@ -2,22 +2,133 @@
 Simple backtesting engine for trading strategies
 """
 
-import csv
 import datetime
+import importlib.util
 import json
-import os
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List, Any, Type, Optional, Tuple
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from src.trading.strategy import TradingStrategy
 from src.utils.logger import setup_logger
 
 logger = setup_logger("backtest")
 
+# Record layouts for the per-bar equity curve and the per-day returns
+EQUITY_DTYPE = np.dtype([('date', 'datetime64[ns]'), ('equity', 'f8'), ('close', 'f8')])
+RETURNS_DTYPE = np.dtype([('date', 'datetime64[D]'), ('return', 'f8')])
+
+# Record layout for the numeric state of each backtest position
+POSITION_DTYPE = np.dtype([
+    ('quantity', 'i8'),
+    ('average_price', 'f8'),
+    ('close_price', 'f8'),
+    ('last_price', 'f8'),
+    ('realized_pnl', 'f8'),
+    ('unrealized_pnl', 'f8')
+])
+
+# Price data columns and their types; the pyarrow CSV reader is used when installed
+PRICE_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+PRICE_DTYPES = {'Open': np.float64, 'High': np.float64, 'Low': np.float64, 'Close': np.float64}
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
+def _to_records(dtype: np.dtype, *columns) -> np.ndarray:
+    """Assemble a structured array from one column per dtype field"""
+    records = np.empty(len(columns[0]), dtype=dtype)
+    for name, column in zip(dtype.names, columns):
+        records[name] = column
+    return records
+
+def _daily_returns(date_values: np.ndarray, equity: np.ndarray) -> np.ndarray:
+    """
+    Compute daily returns from a per-bar equity curve
+    
+    Each day's return is measured from the equity at the first bar of that day
+    to the equity at the first bar of the next day.
+    
+    Args:
+        date_values: Bar timestamps (datetime64)
+        equity: Equity at each bar
+    
+    Returns:
+        Structured array of daily returns (RETURNS_DTYPE)
+    """
+    day_ids = date_values.astype('datetime64[D]')
+    boundaries = np.flatnonzero(day_ids[1:] != day_ids[:-1]) + 1
+    boundary_equity = equity[boundaries]
+    prev_equity = np.concatenate(([0.0], boundary_equity[:-1]))
+    returns = (boundary_equity - prev_equity) / np.where(prev_equity != 0, prev_equity, 1)
+    return_dates = day_ids[boundaries - 1]
+    
+    # Add final day's return if we have data
+    if len(boundaries) > 0 and boundary_equity[-1] != 0:
+        return_dates = np.append(return_dates, day_ids[-1])
+        returns = np.append(returns, (equity[-1] - boundary_equity[-1]) / boundary_equity[-1])
+    
+    return _to_records(RETURNS_DTYPE, return_dates, returns)
+
+def _json_default(obj: Any) -> Any:
+    """Serialize values the JSON encoder does not handle natively"""
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def read_price_csv(data_path: str) -> Optional[pd.DataFrame]:
+    """
+    Read OHLCV price data from a CSV file, sorted by date
+    
+    Args:
+        data_path: Path to the CSV file
+    
+    Returns:
+        DataFrame with the price columns, or None if the file could not be loaded
+    """
+    # Check required columns from the header before reading the data
+    try:
+        columns = pd.read_csv(data_path, nrows=0).columns
+    except Exception as e:
+        logger.error(f"Error loading data: {e}")
+        return None
+    
+    missing_columns = [col for col in PRICE_COLUMNS if col not in columns]
+    
+    if missing_columns:
+        logger.error(f"Missing required columns: {missing_columns}")
+        return None
+    
+    # Load data
+    try:
+        data = pd.read_csv(data_path, engine=CSV_ENGINE, usecols=PRICE_COLUMNS,
+                           parse_dates=['Date'], dtype=PRICE_DTYPES)
+    except Exception as e:
+        logger.error(f"Error loading data: {e}")
+        return None
+    
+    # Ensure Date column is datetime (parse_dates leaves unparseable columns as text)
+    if not pd.api.types.is_datetime64_any_dtype(data['Date']):
+        try:
+            data['Date'] = pd.to_datetime(data['Date'])
+        except Exception as e:
+            logger.error(f"Error converting Date column to datetime: {e}")
+            return None
+    
+    # Sort data by date, unless it is already in order
+    if not data['Date'].is_monotonic_increasing:
+        data = data.sort_values('Date')
+    
+    return data
+
 class MockInstrument:
     """Mock instrument for backtesting"""
     
@@ -48,22 +159,35 @@ class MockOrder:
         self.timestamp = timestamp
         self.status = "COMPLETE"
 
+def _record_field(name: str, cast: type) -> property:
+    """Property reading and writing one field of a position's record"""
+    def getter(self):
+        return cast(self._tracker.records[name][self._slot])
+    
+    def setter(self, value):
+        self._tracker.records[name][self._slot] = value
+    
+    return property(getter, setter)
+
 class MockPosition:
-    """Mock position for backtesting"""
+    """Mock position for backtesting, viewing its record in the tracker's position array"""
     
-    def __init__(self, instrument_key, exchange, symbol, quantity, average_price, last_price):
+    quantity = _record_field('quantity', int)
+    average_price = _record_field('average_price', float)
+    close_price = _record_field('close_price', float)
+    last_price = _record_field('last_price', float)
+    realized_pnl = _record_field('realized_pnl', float)
+    unrealized_pnl = _record_field('unrealized_pnl', float)
+    
+    def __init__(self, tracker, slot, instrument_key, exchange, symbol):
+        self._tracker = tracker
+        self._slot = slot
         self.instrument_key = instrument_key
         self.exchange = exchange
         self.symbol = symbol
         self.product = "BACKTEST"
-        self.quantity = quantity
         self.overnight_quantity = 0
         self.multiplier = 1.0
-        self.average_price = average_price
-        self.close_price = last_price
-        self.last_price = last_price
-        self.unrealized_pnl = (last_price - average_price) * quantity
-        self.realized_pnl = 0.0
     
     @property
     def total_pnl(self) -> float:
@@ -134,135 +258,159 @@ class MockOrderManager:
             price=use_price
         )
 
+def _apply_fill(is_buy: bool, current_quantity: int, current_average_price: float,
+                realized_pnl: float, quantity: int, price: float) -> Tuple[int, float, float]:
+    """
+    Apply a fill to a position's numeric state
+    
+    Pure scalar arithmetic with no object access, so it can be compiled
+    (e.g. with Numba) without touching the tracker. Buys and sells share
+    one path by working on signed quantities.
+    
+    Returns:
+        Tuple of (new_quantity, new_average_price, realized_pnl)
+    """
+    if quantity == 0:
+        return current_quantity, current_average_price, realized_pnl
+    
+    signed_quantity = quantity if is_buy else -quantity
+    new_quantity = current_quantity + signed_quantity
+    
+    if current_quantity == 0 or (current_quantity > 0) == (signed_quantity > 0):
+        # Opening or adding to a position in the same direction
+        if current_quantity == 0:
+            new_average_price = price
+        else:
+            new_average_price = ((abs(current_quantity) * current_average_price) + (quantity * price)) / abs(new_quantity)
+        return new_quantity, new_average_price, realized_pnl
+    
+    # Reducing, closing or flipping: realize P&L on the closed portion
+    closing_quantity = min(abs(current_quantity), quantity)
+    direction = 1 if current_quantity > 0 else -1
+    realized_pnl += (price - current_average_price) * closing_quantity * direction
+    
+    if new_quantity == 0:
+        # Fully closed, reset average price
+        new_average_price = 0
+    elif (new_quantity > 0) == (current_quantity > 0):
+        # Keep the same average price for the remaining position
+        new_average_price = current_average_price
+    else:
+        # Flipped, the remainder is a fresh position at the fill price
+        new_average_price = price
+    
+    return new_quantity, new_average_price, realized_pnl
+
 class MockPositionTracker:
     """Mock position tracker for backtesting"""
     
-    def __init__(self):
+    def __init__(self, capacity: int = 16):
+        # Numeric position state lives in one record per instrument; positions maps keys to views
+        self.records = np.zeros(capacity, dtype=POSITION_DTYPE)
         self.positions = {}
-        self.position_callbacks = {}
+        self.position_callbacks = defaultdict(list)
         self.global_callbacks = []
+        
+        # Set once any callback is registered, so the common no-callback run skips dispatch
+        self._has_any_callbacks = False
+        
+        # Running P&L totals across all positions
+        self._total_realized = 0.0
+        self._total_unrealized = 0.0
+    
+    @property
+    def total_pnl(self) -> float:
+        """Total P&L (realized + unrealized) across all positions"""
+        return self._total_realized + self._total_unrealized
     
     def get_position(self, instrument_key: str) -> Optional[MockPosition]:
         """Get a position by instrument key"""
         return self.positions.get(instrument_key)
     
+    def _add_position(self, instrument_key: str) -> MockPosition:
+        """Allocate a record for a new position, growing the position array when full"""
+        slot = len(self.positions)
+        if slot == len(self.records):
+            records = np.zeros(2 * len(self.records), dtype=POSITION_DTYPE)
+            records[:slot] = self.records
+            self.records = records
+        
+        # This would typically come from the instrument, but we use placeholders
+        position = MockPosition(
+            tracker=self,
+            slot=slot,
+            instrument_key=instrument_key,
+            exchange="BACKTEST",
+            symbol=instrument_key.split("_")[-1]
+        )
+        self.positions[instrument_key] = position
+        return position
+    
     def update_position(self, instrument_key: str, transaction_type: str, quantity: int, price: float, timestamp: datetime.datetime):
         """Update a position based on a new order"""
         position = self.positions.get(instrument_key)
+        if position is None:
+            position = self._add_position(instrument_key)
         
-        # Get instrument details from existing position or create placeholder
-        if position:
-            exchange = position.exchange
-            symbol = position.symbol
-            current_quantity = position.quantity
-            current_average_price = position.average_price
-            realized_pnl = position.realized_pnl
-        else:
-            # This would typically come from the instrument, but we use placeholders
-            exchange = "BACKTEST"
-            symbol = instrument_key.split("_")[-1]
-            current_quantity = 0
-            current_average_price = 0
-            realized_pnl = 0
-        
-        # Calculate new quantity
-        if transaction_type == "BUY":
-            # If we're short, this is reducing position size
-            if current_quantity < 0 and abs(current_quantity) >= quantity:
-                # Partial or full cover
-                new_quantity = current_quantity + quantity
-                closing_quantity = quantity
-                
-                # Calculate realized P&L for the closed portion
-                trade_pnl = (current_average_price - price) * closing_quantity
-                realized_pnl += trade_pnl
-                
-                # If full cover, reset average price
-                if new_quantity == 0:
-                    new_average_price = 0
-                else:
-                    # Keep the same average price for remaining short position
-                    new_average_price = current_average_price
-            else:
-                # Adding to long position or flipping from short to long
-                closing_quantity = min(abs(current_quantity), quantity) if current_quantity < 0 else 0
-                new_position_quantity = quantity - closing_quantity
-                
-                # Calculate realized P&L for any closed portion
-                if closing_quantity > 0:
-                    trade_pnl = (current_average_price - price) * closing_quantity
-                    realized_pnl += trade_pnl
-                
-                # Calculate new position details
-                if current_quantity <= 0:
-                    # Starting fresh long position
-                    new_quantity = new_position_quantity
-                    new_average_price = price
-                else:
-                    # Adding to existing long position
-                    new_quantity = current_quantity + quantity
-                    new_average_price = ((current_quantity * current_average_price) + (quantity * price)) / new_quantity
-        else:  # SELL
-            # If we're long, this is reducing position size
-            if current_quantity > 0 and current_quantity >= quantity:
-                # Partial or full liquidation
-                new_quantity = current_quantity - quantity
-                closing_quantity = quantity
-                
-                # Calculate realized P&L for the closed portion
-                trade_pnl = (price - current_average_price) * closing_quantity
-                realized_pnl += trade_pnl
-                
-                # If fully liquidated, reset average price
-                if new_quantity == 0:
-                    new_average_price = 0
-                else:
-                    # Keep the same average price for remaining long position
-                    new_average_price = current_average_price
-            else:
-                # Adding to short position or flipping from long to short
-                closing_quantity = min(current_quantity, quantity) if current_quantity > 0 else 0
-                new_position_quantity = quantity - closing_quantity
-                
-                # Calculate realized P&L for any closed portion
-                if closing_quantity > 0:
-                    trade_pnl = (price - current_average_price) * closing_quantity
-                    realized_pnl += trade_pnl
-                
-                # Calculate new position details
-                if current_quantity >= 0:
-                    # Starting fresh short position
-                    new_quantity = -new_position_quantity
-                    new_average_price = price
-                else:
-                    # Adding to existing short position
-                    new_quantity = current_quantity - quantity
-                    # For shorts, we use a weighted average entry price
-                    current_abs_quantity = abs(current_quantity)
-                    new_abs_quantity = abs(new_quantity)
-                    new_average_price = ((current_abs_quantity * current_average_price) + (quantity * price)) / new_abs_quantity
-        
-        # Create or update position
-        self.positions[instrument_key] = MockPosition(
-            instrument_key=instrument_key,
-            exchange=exchange,
-            symbol=symbol,
-            quantity=new_quantity,
-            average_price=new_average_price if new_quantity != 0 else 0,
-            last_price=price
-        )
+        # Read the whole record as Python scalars in one call
+        slot = position._slot
+        current_quantity, current_average_price, _, _, previous_realized, previous_unrealized = self.records[slot].item()
         
-        # Set realized P&L
-        self.positions[instrument_key].realized_pnl = realized_pnl
+        new_quantity, new_average_price, realized_pnl = _apply_fill(
+            transaction_type == "BUY", current_quantity, current_average_price,
+            previous_realized, quantity, price
+        )
+        unrealized_pnl = (price - new_average_price) * new_quantity
+        
+        # Write the position's record back in one assignment
+        self.records[slot] = (
+            new_quantity,
+            new_average_price if new_quantity != 0 else 0,
+            price,
+            price,
+            realized_pnl,
+            unrealized_pnl
+        )
         
-        # Update unrealized P&L
-        self.positions[instrument_key].unrealized_pnl = (price - new_average_price) * new_quantity
+        # Swap the previous P&L out of the running totals
+        self._total_realized -= previous_realized
+        self._total_unrealized -= previous_unrealized
+        self._total_realized += realized_pnl
+        self._total_unrealized += unrealized_pnl
         
+        if self._has_any_callbacks:
+            self._dispatch_callbacks(instrument_key, position)
+    
+    def update_market_price(self, instrument_key: str, price: float):
+        """Update the market price for a position"""
+        position = self.positions.get(instrument_key)
+        if position is not None:
+            slot = position._slot
+            quantity, average_price, close_price, last_price, realized_pnl, previous_unrealized = self.records[slot].item()
+            
+            # Nothing to revalue if the price hasn't moved
+            if last_price == price:
+                return
+            
+            # A flat position has no unrealized P&L to recompute
+            if quantity == 0:
+                self.records[slot]['last_price'] = price
+                return
+            
+            unrealized_pnl = (price - average_price) * quantity
+            self._total_unrealized += unrealized_pnl - previous_unrealized
+            self.records[slot] = (quantity, average_price, close_price, price, realized_pnl, unrealized_pnl)
+            
+            if self._has_any_callbacks:
+                self._dispatch_callbacks(instrument_key, position)
+    
+    def _dispatch_callbacks(self, instrument_key: str, position: MockPosition):
+        """Call the position callbacks for an instrument, then the global callbacks"""
         # Call position callbacks
-        if instrument_key in self.position_callbacks:
+        if self.position_callbacks[instrument_key]:
             for callback in self.position_callbacks[instrument_key]:
                 try:
-                    callback(self.positions[instrument_key])
+                    callback(position)
                 except Exception as e:
                     logger.error(f"Error in position callback: {e}")
         
@@ -273,38 +421,15 @@ class MockPositionTracker:
             except Exception as e:
                 logger.error(f"Error in global position callback: {e}")
     
-    def update_market_price(self, instrument_key: str, price: float):
-        """Update the market price for a position"""
-        if instrument_key in self.positions:
-            position = self.positions[instrument_key]
-            position.last_price = price
-            position.unrealized_pnl = (price - position.average_price) * position.quantity
-            
-            # Call position callbacks
-            if instrument_key in self.position_callbacks:
-                for callback in self.position_callbacks[instrument_key]:
-                    try:
-                        callback(position)
-                    except Exception as e:
-                        logger.error(f"Error in position callback: {e}")
-            
-            # Call global callbacks
-            for callback in self.global_callbacks:
-                try:
-                    callback(self.positions)
-                except Exception as e:
-                    logger.error(f"Error in global position callback: {e}")
-    
     def register_position_callback(self, instrument_key: str, callback):
         """Register a callback for position updates"""
-        if instrument_key not in self.position_callbacks:
-            self.position_callbacks[instrument_key] = []
-        
         self.position_callbacks[instrument_key].append(callback)
+        self._has_any_callbacks = True
     
     def register_global_callback(self, callback):
         """Register a callback for all position updates"""
         self.global_callbacks.append(callback)
+        self._has_any_callbacks = True
     
     def fetch_positions(self):
         """Fetch all positions"""
@@ -328,6 +453,7 @@ class BacktestEngine:
         self.strategy = None
         self.instruments = {}
         self.results = None
+        self._orders_processed = 0  # Cursor into order_manager.orders
     
     def load_price_data(self, data_path: str, instrument_key: str = None, exchange: str = "NSE", symbol: str = None):
         """
@@ -339,25 +465,26 @@ class BacktestEngine:
             exchange: Exchange (optional, default: NSE)
             symbol: Symbol (optional, will be extracted from filename if not provided)
         """
-        # Load data
-        try:
-            data = pd.read_csv(data_path)
-        except Exception as e:
-            logger.error(f"Error loading data: {e}")
-            return False
-        
-        # Check required columns
-        required_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
-        missing_columns = [col for col in required_columns if col not in data.columns]
-        
-        if missing_columns:
-            logger.error(f"Missing required columns: {missing_columns}")
+        data = read_price_csv(data_path)
+        if data is None:
             return False
         
         # Generate symbol from filename if not provided
         if not symbol:
             symbol = Path(data_path).stem.upper()
         
+        return self.set_price_data(data, symbol, instrument_key=instrument_key, exchange=exchange)
+    
+    def set_price_data(self, data: pd.DataFrame, symbol: str, instrument_key: str = None, exchange: str = "NSE"):
+        """
+        Use already loaded price data, sorted by date
+        
+        Args:
+            data: DataFrame with Date, Open, High, Low, Close and Volume columns
+            symbol: Symbol
+            instrument_key: Instrument key (optional, will be generated if not provided)
+            exchange: Exchange (optional, default: NSE)
+        """
         # Generate instrument key if not provided
         if not instrument_key:
             instrument_key = f"{exchange}_EQ_{symbol}"
@@ -371,16 +498,6 @@ class BacktestEngine:
             instrument_type="EQ"
         )
         
-        # Ensure Date column is datetime
-        try:
-            data['Date'] = pd.to_datetime(data['Date'])
-        except Exception as e:
-            logger.error(f"Error converting Date column to datetime: {e}")
-            return False
-        
-        # Sort data by date
-        data = data.sort_values('Date')
-        
         # Add instrument key column
         data['instrument_key'] = instrument_key
         
@@ -394,6 +511,9 @@ class BacktestEngine:
         """
         Run the backtest
         
+        The tick data dict passed to the strategy is reused for every bar, so
+        strategies must copy it rather than keep a reference to it.
+        
         Returns:
             Dictionary of backtest results
         """
@@ -410,39 +530,61 @@ class BacktestEngine:
         self.strategy.set_parameters(self.strategy_params)
         self.strategy.set_instruments(list(self.instruments.values()))
         
-        # Initialize tracking variables
-        trades = []
-        equity_curve = []
-        current_equity = 0
-        
-        # Track daily returns
-        daily_returns = []
-        prev_date = None
-        prev_equity = 0
-        
         # Run strategy initialization
         self.strategy.initialize()
         
+        # Extract columns once as lists of Python scalars, which the bar loop
+        # indexes and computes with faster than NumPy scalars
+        dates = self.price_data['Date'].tolist()
+        opens = self.price_data['Open'].to_numpy(dtype=np.float64).tolist()
+        highs = self.price_data['High'].to_numpy(dtype=np.float64).tolist()
+        lows = self.price_data['Low'].to_numpy(dtype=np.float64).tolist()
+        closes = self.price_data['Close'].to_numpy(dtype=np.float64)
+        close_prices = closes.tolist()
+        volumes = self.price_data['Volume'].tolist()
+        date_values = self.price_data['Date'].to_numpy()
+        n_bars = len(dates)
+        
+        # Single-instrument runs (the usual case) share one key object across all bars,
+        # so position lookups hit the dict's identity fast path
+        key_column = self.price_data['instrument_key']
+        if n_bars > 0 and key_column.nunique() == 1:
+            keys = [key_column.iloc[0]] * n_bars
+        else:
+            keys = key_column.tolist()
+        
+        # Initialize tracking variables (daily returns are derived from the equity curve afterwards)
+        trades = []
+        equity = np.empty(n_bars, dtype=np.float64)
+        
+        # Market data, updated in place for each bar instead of allocated per bar
+        tick_data = {
+            'instrument_key': None,
+            'ltp': 0.0,
+            'open': 0.0,
+            'high': 0.0,
+            'low': 0.0,
+            'close': 0.0,
+            'volume': 0,
+            'timestamp': None
+        }
+        
         # Process each bar
-        for idx, row in self.price_data.iterrows():
-            date = row['Date']
-            instrument_key = row['instrument_key']
-            instrument = self.instruments[instrument_key]
+        for i in range(n_bars):
+            instrument_key = keys[i]
+            close = close_prices[i]
             
-            # Create market data
-            tick_data = {
-                'instrument_key': instrument_key,
-                'ltp': row['Close'],
-                'open': row['Open'],
-                'high': row['High'],
-                'low': row['Low'],
-                'close': row['Close'],
-                'volume': row['Volume'],
-                'timestamp': date
-            }
+            tick_data['instrument_key'] = instrument_key
+            tick_data['ltp'] = close
+            tick_data['open'] = opens[i]
+            tick_data['high'] = highs[i]
+            tick_data['low'] = lows[i]
+            tick_data['close'] = close
+            tick_data['volume'] = volumes[i]
+            tick_data['timestamp'] = dates[i]
             
             # Update position market prices
-            self.position_tracker.update_market_price(instrument_key, row['Close'])
+            self.position_tracker.update_market_price(instrument_key, close)
             
             # Process tick data in strategy
             try:
@@ -450,33 +592,16 @@ class BacktestEngine:
             except Exception as e:
                 logger.error(f"Error processing tick data: {e}")
             
-            # Calculate equity at this point
-            current_positions = self.position_tracker.fetch_positions()
-            current_equity = sum([pos.realized_pnl + pos.unrealized_pnl for pos in current_positions])
-            
             # Track equity curve
-            equity_curve.append({
-                'date': date,
-                'equity': current_equity,
-                'close': row['Close']
-            })
-            
-            # Track daily returns (if we've moved to a new day)
-            if prev_date is not None and date.date() != prev_date.date():
-                daily_return = (current_equity - prev_equity) / (prev_equity if prev_equity != 0 else 1)
-                daily_returns.append({
-                    'date': prev_date.date(),
-                    'return': daily_return
-                })
-                prev_equity = current_equity
+            equity[i] = self.position_tracker.total_pnl
             
-            prev_date = date
-            
-            # Process any new orders
-            for order in self.order_manager.orders:
-                if order not in trades:
-                    trades.append(order)
-                    
+            # Process any new orders (the order list is append-only)
+            if len(self.order_manager.orders) > self._orders_processed:
+                new_orders = self.order_manager.orders[self._orders_processed:]
+                self._orders_processed += len(new_orders)
+                trades.extend(new_orders)
+                
+                for order in new_orders:
                     # Update positions based on order
                     self.position_tracker.update_position(
                         instrument_key=order.instrument_key,
@@ -486,13 +611,80 @@ class BacktestEngine:
                         timestamp=order.timestamp
                     )
         
-        # Add final day's return if we have data
-        if prev_date is not None and prev_equity != 0:
-            daily_return = (current_equity - prev_equity) / prev_equity
-            daily_returns.append({
-                'date': prev_date.date(),
-                'return': daily_return
-            })
+        equity_curve = _to_records(EQUITY_DTYPE, date_values, equity, closes)
+        daily_returns = _daily_returns(date_values, equity)
+        
+        # Calculate performance metrics
+        self.results = self._calculate_performance_metrics(trades, equity_curve, daily_returns)
+        
+        return self.results
+    
+    def run_vectorized(self) -> Dict[str, Any]:
+        """
+        Run the backtest in vectorized mode
+        
+        Asks the strategy for a target position per bar via
+        TradingStrategy.generate_signals and computes fills and P&L for all bars
+        with array operations. Position changes are filled at the bar's close,
+        one netted order per change. Falls back to the event-driven run() if the
+        strategy does not provide signals.
+        
+        Returns:
+            Dictionary of backtest results
+        """
+        if not hasattr(self, 'price_data') or self.price_data is None:
+            logger.error("No price data loaded")
+            return None
+        
+        if not self.instruments:
+            logger.error("No instruments defined")
+            return None
+        
+        # Initialize strategy
+        self.strategy = self.strategy_class(None, self.order_manager, self.position_tracker)
+        self.strategy.set_parameters(self.strategy_params)
+        self.strategy.set_instruments(list(self.instruments.values()))
+        self.strategy.initialize()
+        
+        signals = self.strategy.generate_signals(self.price_data)
+        if signals is None:
+            logger.info("Strategy does not provide vectorized signals, running event-driven backtest")
+            self.strategy = None
+            return self.run()
+        
+        targets = np.asarray(signals, dtype=np.float64)
+        if len(targets) != len(self.price_data):
+            logger.error(f"Signal length {len(targets)} does not match {len(self.price_data)} price bars")
+            return None
+        
+        dates = self.price_data['Date'].tolist()
+        keys = self.price_data['instrument_key'].to_numpy()
+        closes = self.price_data['Close'].to_numpy(dtype=np.float64)
+        
+        # Position held through each bar is the target set at the previous bar's close
+        held = np.concatenate(([0.0], targets[:-1]))
+        price_moves = np.diff(closes, prepend=closes[0])
+        equity = np.cumsum(held * price_moves)
+        
+        # Every change in target position is one fill at that bar's close
+        deltas = np.diff(targets, prepend=0.0)
+        trades = []
+        for i in np.flatnonzero(deltas):
+            trades.append(MockOrder(
+                order_id=f"BT_{self.order_manager.next_order_id}",
+                instrument_key=keys[i],
+                transaction_type="BUY" if deltas[i] > 0 else "SELL",
+                quantity=int(abs(deltas[i])),
+                price=closes[i],
+                timestamp=dates[i]
+            ))
+            self.order_manager.next_order_id += 1
+        self.order_manager.orders.extend(trades)
+        self._orders_processed = len(self.order_manager.orders)
+        
+        date_values = self.price_data['Date'].to_numpy()
+        equity_curve = _to_records(EQUITY_DTYPE, date_values, equity, closes)
+        daily_returns = _daily_returns(date_values, equity)
         
         # Calculate performance metrics
         self.results = self._calculate_performance_metrics(trades, equity_curve, daily_returns)
@@ -501,37 +693,47 @@ class BacktestEngine:
     
     def _calculate_performance_metrics(self, trades, equity_curve, daily_returns) -> Dict[str, Any]:
         """Calculate performance metrics from backtest results"""
-        if not equity_curve:
+        if len(equity_curve) == 0:
             return {}
-            
-        # Convert to DataFrame for easier analysis
-        equity_df = pd.DataFrame(equity_curve)
-        returns_df = pd.DataFrame(daily_returns) if daily_returns else pd.DataFrame(columns=['date', 'return'])
+        
+        dates = pd.DatetimeIndex(equity_curve['date'])
+        equity = equity_curve['equity']
+        returns = daily_returns['return']
         
         # Basic metrics
-        start_equity = equity_df.iloc[0]['equity']
-        end_equity = equity_df.iloc[-1]['equity']
+        start_equity = equity[0]
+        end_equity = equity[-1]
         total_return = ((end_equity - start_equity) / start_equity) * 100 if start_equity != 0 else 0
         
         # Trading metrics
         num_trades = len(trades)
         
-        # Drawdown analysis
-        equity_df['peak'] = equity_df['equity'].cummax()
-        equity_df['drawdown'] = (equity_df['equity'] - equity_df['peak']) / equity_df['peak'] * 100
-        max_drawdown = equity_df['drawdown'].min()
-        
-        # Return statistics
-        if not returns_df.empty:
-            avg_daily_return = returns_df['return'].mean() * 100
-            std_daily_return = returns_df['return'].std() * 100
+        # Drawdown analysis, computed in place in one buffer (no drawdown is defined while the peak is zero)
+        peak = np.maximum.accumulate(equity)
+        has_peak = peak != 0
+        drawdown = np.subtract(equity, peak)
+        np.divide(drawdown, peak, out=drawdown, where=has_peak)
+        np.multiply(drawdown, 100, out=drawdown)
+        drawdown[~has_peak] = 0.0
+        max_drawdown = drawdown.min()
+        
+        # Return statistics, reusing the mean for the deviations
+        n_returns = len(returns)
+        if n_returns > 0:
+            mean_return = returns.mean()
+            avg_daily_return = mean_return * 100
+            if n_returns > 1:
+                deviations = returns - mean_return
+                std_daily_return = np.sqrt(np.square(deviations, out=deviations).sum() / (n_returns - 1)) * 100
+            else:
+                std_daily_return = np.nan
             
             # Sharpe ratio (assuming risk-free rate of 0)
             days_per_year = 252  # Trading days in a year
             sharpe_ratio = (avg_daily_return / 100) * np.sqrt(days_per_year) / (std_daily_return / 100) if std_daily_return != 0 else 0
             
             # Annualized return
-            total_days = (equity_df.iloc[-1]['date'] - equity_df.iloc[0]['date']).days
+            total_days = (dates[-1] - dates[0]).days
             if total_days > 0:
                 years = total_days / 365
                 annualized_return = ((1 + total_return / 100) ** (1 / years) - 1) * 100
@@ -545,8 +747,8 @@ class BacktestEngine:
         
         # Create results dictionary
         results = {
-            'start_date': equity_df.iloc[0]['date'],
-            'end_date': equity_df.iloc[-1]['date'],
+            'start_date': dates[0],
+            'end_date': dates[-1],
             'start_equity': start_equity,
             'end_equity': end_equity,
             'total_return_pct': total_return,
@@ -556,7 +758,12 @@ class BacktestEngine:
             'avg_daily_return_pct': avg_daily_return,
             'std_daily_return_pct': std_daily_return,
             'sharpe_ratio': sharpe_ratio,
-            'equity_curve': equity_df.to_dict('records'),
+            'equity_curve': [
+                {'date': date, 'equity': value, 'close': close, 'peak': high, 'drawdown': dd}
+                for date, value, close, high, dd in zip(
+                    dates, equity.tolist(), equity_curve['close'].tolist(), peak.tolist(), drawdown.tolist()
+                )
+            ],
             'trades': [{'order_id': t.order_id, 
                         'instrument_key': t.instrument_key, 
                         'transaction_type': t.transaction_type, 
@@ -573,6 +780,9 @@ class BacktestEngine:
             logger.error("No backtest results to plot")
             return
         
+        # Imported here so runs that never plot don't pay for loading matplotlib
+        import matplotlib.pyplot as plt
+        
         # Create figure with subplots
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [3, 1]})
         
@@ -628,25 +838,14 @@ class BacktestEngine:
             return False
         
         try:
-            # Convert dates to strings for JSON serialization
-            serializable_results = self.results.copy()
-            
-            # Handle start and end dates
-            serializable_results['start_date'] = str(serializable_results['start_date'])
-            serializable_results['end_date'] = str(serializable_results['end_date'])
-            
-            # Handle equity curve dates
-            for item in serializable_results['equity_curve']:
-                item['date'] = str(item['date'])
-            
-            # Handle trade timestamps
-            for trade in serializable_results['trades']:
-                if trade['timestamp'] is not None:
-                    trade['timestamp'] = str(trade['timestamp'])
-            
-            # Save to file
-            with open(file_path, 'w') as f:
-                json.dump(serializable_results, f, indent=2)
+            # Dates and NumPy scalars are encoded as they are written, leaving the results untouched
+            if orjson is not None:
+                with open(file_path, 'wb') as f:
+                    f.write(orjson.dumps(self.results, default=_json_default,
+                                         option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2))
+            else:
+                with open(file_path, 'w') as f:
+                    json.dump(self.results, f, indent=2, default=_json_default)
             
             logger.info(f"Results saved to {file_path}")
             return True
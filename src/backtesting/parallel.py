@@ -0,0 +1,224 @@
+"""
+Parallel backtesting across instruments using worker processes
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, List, Any, Type, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting.backtest import BacktestEngine, PRICE_COLUMNS, read_price_csv
+from src.trading.strategy import TradingStrategy
+from src.utils.logger import logger
+
+def run_single(data_path: str, strategy_class: Type[TradingStrategy],
+               params: Dict[str, Any] = None, exchange: str = "NSE") -> Optional[Dict[str, Any]]:
+    """
+    Run a backtest for one price data file
+    
+    Defined at module level so it can be pickled and run in a worker process.
+    
+    Args:
+        data_path: Path to the CSV file
+        strategy_class: Strategy class to test
+        params: Strategy parameters (optional)
+        exchange: Exchange (optional, default: NSE)
+    
+    Returns:
+        Backtest results, or None if the data could not be loaded or the run failed
+    """
+    engine = BacktestEngine(strategy_class, params)
+    if not engine.load_price_data(data_path, exchange=exchange):
+        return None
+    
+    return engine.run()
+
+class BacktestDataStore:
+    """Price data loaded once into shared memory, for workers to view without copying"""
+    
+    def __init__(self):
+        """Initialize an empty store"""
+        self._blocks: List[SharedMemory] = []
+        self.spec: Optional[Dict[str, Any]] = None
+    
+    def load(self, data_path: str, exchange: str = "NSE", symbol: str = None) -> bool:
+        """
+        Load a price data file into shared memory blocks, one per column
+        
+        Args:
+            data_path: Path to the CSV file
+            exchange: Exchange (optional, default: NSE)
+            symbol: Symbol (optional, will be extracted from filename if not provided)
+        
+        Returns:
+            True if the data was loaded
+        """
+        data = read_price_csv(data_path)
+        if data is None:
+            return False
+        
+        columns = {}
+        for column in PRICE_COLUMNS:
+            values = data[column].to_numpy()
+            if values.dtype.hasobject:
+                logger.error(f"Cannot share non-numeric column: {column}")
+                self.close()
+                return False
+            
+            block = SharedMemory(create=True, size=max(values.nbytes, 1))
+            self._blocks.append(block)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            columns[column] = (block.name, values.shape, values.dtype.str)
+        
+        # Published to workers, which attach to the blocks by name
+        self.spec = {
+            'symbol': symbol or Path(data_path).stem.upper(),
+            'exchange': exchange,
+            'columns': columns
+        }
+        
+        logger.info(f"Loaded {len(data)} price bars into shared memory for {self.spec['symbol']}")
+        return True
+    
+    def close(self):
+        """Release the shared memory blocks"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        
+        self._blocks = []
+        self.spec = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Shared price data attached once per worker process
+_worker_spec: Optional[Dict[str, Any]] = None
+_worker_blocks: List[SharedMemory] = []
+
+def _attach_shared_data(spec: Dict[str, Any]):
+    """Worker initializer: attach to the store's shared memory blocks"""
+    global _worker_spec
+    
+    _worker_spec = spec
+    _worker_blocks.extend(SharedMemory(name=name) for name, _, _ in spec['columns'].values())
+
+def _run_shared(strategy_class: Type[TradingStrategy], params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Run a backtest on the shared price data attached to this worker
+    
+    Args:
+        strategy_class: Strategy class to test
+        params: Strategy parameters
+    
+    Returns:
+        Backtest results, or None if the run failed
+    """
+    # Build a frame over views of the shared columns, without copying them
+    data = pd.DataFrame({
+        column: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        for block, (column, (_, shape, dtype)) in zip(_worker_blocks, _worker_spec['columns'].items())
+    }, copy=False)
+    
+    engine = BacktestEngine(strategy_class, params)
+    engine.set_price_data(data, _worker_spec['symbol'], exchange=_worker_spec['exchange'])
+    
+    return engine.run()
+
+class BacktestOrchestrator:
+    """Runs independent backtests in parallel worker processes"""
+    
+    def __init__(self, strategy_class: Type[TradingStrategy], params: Dict[str, Any] = None,
+                 n_workers: Optional[int] = None):
+        """
+        Initialize the orchestrator
+        
+        Args:
+            strategy_class: Strategy class to test
+            params: Strategy parameters (optional)
+            n_workers: Number of worker processes (optional, default: CPU count)
+        """
+        self.strategy_class = strategy_class
+        self.strategy_params = params or {}
+        self.n_workers = n_workers or os.cpu_count() or 1
+    
+    def run_parallel(self, data_paths: List[str], exchange: str = "NSE") -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Backtest the strategy on each price data file in its own process
+        
+        Args:
+            data_paths: Paths to CSV files, one per instrument
+            exchange: Exchange (optional, default: NSE)
+        
+        Returns:
+            Dictionary mapping each data path to its backtest results (None on failure)
+        """
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        with ProcessPoolExecutor(max_workers=min(self.n_workers, max(len(data_paths), 1))) as executor:
+            futures = {
+                executor.submit(run_single, path, self.strategy_class, self.strategy_params, exchange): path
+                for path in data_paths
+            }
+            
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logger.error(f"Backtest failed for {path}: {e}")
+                    results[path] = None
+        
+        completed = sum(1 for result in results.values() if result)
+        logger.info(f"Completed {completed}/{len(data_paths)} parallel backtests")
+        
+        return results
+    
+    def run_sweep(self, data_path: str, param_grid: List[Dict[str, Any]],
+                  exchange: str = "NSE") -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        Backtest the strategy on one price data file for each set of parameters
+        
+        The file is loaded once into shared memory and each worker attaches to it,
+        rather than every run re-reading the CSV.
+        
+        Args:
+            data_path: Path to the CSV file
+            param_grid: Parameter sets to test, each merged over the orchestrator's parameters
+            exchange: Exchange (optional, default: NSE)
+        
+        Returns:
+            List of (parameters, backtest results) in grid order, with None results on failure
+        """
+        param_sets = [{**self.strategy_params, **params} for params in param_grid]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(param_sets)
+        
+        with BacktestDataStore() as store:
+            if not store.load(data_path, exchange=exchange):
+                return list(zip(param_sets, results))
+            
+            with ProcessPoolExecutor(max_workers=min(self.n_workers, max(len(param_sets), 1)),
+                                     initializer=_attach_shared_data, initargs=(store.spec,)) as executor:
+                futures = {
+                    executor.submit(_run_shared, self.strategy_class, params): index
+                    for index, params in enumerate(param_sets)
+                }
+                
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        logger.error(f"Backtest failed for parameters {param_sets[index]}: {e}")
+        
+        completed = sum(1 for result in results if result)
+        logger.info(f"Completed {completed}/{len(param_sets)} parameter sweep backtests")
+        
+        return list(zip(param_sets, results))
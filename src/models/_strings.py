@@ -0,0 +1,17 @@
+"""
+String helpers shared by the data models
+"""
+
+import sys
+from typing import Any
+
+
+def intern_string(value: Any) -> Any:
+    """
+    Intern a string from an API response, so repeated values share one object
+    
+    Used for fields repeated across many records, such as instrument keys and
+    statuses. Interned strings are never freed, which is fine for the instruments
+    a session trades but not for unbounded free text.
+    """
+    return sys.intern(value) if type(value) is str else value
@@ -2,11 +2,11 @@
 Instrument data model
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
 
 
-@dataclass
+@dataclass(frozen=True)
 class Instrument:
     """Model representing a tradable instrument"""
     
@@ -23,24 +23,36 @@ class Instrument:
     lot_size: int = 1
     tick_size: float = 0.05
     
+    # Rendered string representation, computed once since instruments are immutable
+    _str: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, '_str', self._render())
+    
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'Instrument':
         """Create an instrument from API response data"""
+        get = data.get
+        strike = get('strike')
         return cls(
-            instrument_key=data.get('instrument_key', ''),
-            exchange=data.get('exchange', ''),
-            symbol=data.get('symbol', ''),
-            name=data.get('name', ''),
-            instrument_type=data.get('instrument_type', ''),
-            expiry=data.get('expiry', None),
-            strike=float(data.get('strike', 0)) if data.get('strike') else None,
-            option_type=data.get('option_type', None),
-            lot_size=int(data.get('lot_size', 1)),
-            tick_size=float(data.get('tick_size', 0.05))
+            instrument_key=get('instrument_key', ''),
+            exchange=get('exchange', ''),
+            symbol=get('symbol', ''),
+            name=get('name', ''),
+            instrument_type=get('instrument_type', ''),
+            expiry=get('expiry', None),
+            strike=float(strike) if strike else None,
+            option_type=get('option_type', None),
+            lot_size=int(get('lot_size', 1)),
+            tick_size=float(get('tick_size', 0.05))
         )
     
     def __str__(self) -> str:
         """String representation of the instrument"""
+        return self._str
+    
+    def _render(self) -> str:
+        """Build the string representation of the instrument"""
         if self.instrument_type == 'EQ':
             return f"{self.symbol} ({self.exchange})"
         elif self.instrument_type in ['FUT', 'CE', 'PE']:
@@ -2,12 +2,31 @@
 Order data model
 """
 
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
+from src.models._strings import intern_string
 
-@dataclass
+# datetime.fromisoformat accepts a trailing 'Z' from Python 3.11
+_FROMISOFORMAT_ACCEPTS_Z = sys.version_info >= (3, 11)
+
+
+@lru_cache(maxsize=4096)
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    """Parse an ISO 8601 API timestamp, cached since polls repeat the same values"""
+    if not _FROMISOFORMAT_ACCEPTS_Z and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
 class Order:
     """Model representing a trading order"""
     
@@ -36,41 +55,55 @@ class Order:
     pending_quantity: Optional[int] = None
     cancelled_quantity: int = 0
     
+    # Rendered string, cleared whenever the order is updated
+    _str_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'Order':
         """Create an order from API response data"""
-        order_timestamp = None
-        if data.get('order_timestamp'):
-            try:
-                order_timestamp = datetime.fromisoformat(data['order_timestamp'].replace('Z', '+00:00'))
-            except ValueError:
-                pass
+        # Allocate without __init__ and fill the slots directly, which skips
+        # keyword argument binding for every parsed record
+        order = object.__new__(cls)
+        order.update_from_api_response(data)
+        return order
+    
+    def update_from_api_response(self, data: Dict[str, Any]):
+        """Update this order in place from API response data"""
+        get = data.get
+        order_timestamp = get('order_timestamp')
         
-        return cls(
-            order_id=data.get('order_id', ''),
-            instrument_key=data.get('instrument_key', ''),
-            exchange=data.get('exchange', ''),
-            symbol=data.get('symbol', ''),
-            transaction_type=data.get('transaction_type', ''),
-            product=data.get('product', ''),
-            order_type=data.get('order_type', ''),
-            quantity=int(data.get('quantity', 0)),
-            status=data.get('status', 'PENDING'),
-            price=float(data.get('price', 0)) if data.get('price') else None,
-            trigger_price=float(data.get('trigger_price', 0)) if data.get('trigger_price') else None,
-            disclosed_quantity=int(data.get('disclosed_quantity', 0)),
-            validity=data.get('validity', 'DAY'),
-            variety=data.get('variety', 'NORMAL'),
-            order_timestamp=order_timestamp,
-            exchange_order_id=data.get('exchange_order_id'),
-            average_price=float(data.get('average_price', 0)) if data.get('average_price') else None,
-            filled_quantity=int(data.get('filled_quantity', 0)),
-            pending_quantity=int(data.get('pending_quantity', 0)) if data.get('pending_quantity') is not None else None,
-            cancelled_quantity=int(data.get('cancelled_quantity', 0)),
-        )
+        self.order_id = get('order_id', '')
+        self.instrument_key = intern_string(get('instrument_key', ''))
+        self.exchange = intern_string(get('exchange', ''))
+        self.symbol = get('symbol', '')
+        self.transaction_type = intern_string(get('transaction_type', ''))
+        self.product = intern_string(get('product', ''))
+        self.order_type = intern_string(get('order_type', ''))
+        self.quantity = int(get('quantity', 0))
+        self.status = intern_string(get('status', 'PENDING'))
+        price = get('price')
+        self.price = float(price) if price else None
+        trigger_price = get('trigger_price')
+        self.trigger_price = float(trigger_price) if trigger_price else None
+        self.disclosed_quantity = int(get('disclosed_quantity', 0))
+        self.validity = intern_string(get('validity', 'DAY'))
+        self.variety = intern_string(get('variety', 'NORMAL'))
+        self.order_timestamp = _parse_timestamp(order_timestamp) if order_timestamp else None
+        self.exchange_order_id = get('exchange_order_id')
+        average_price = get('average_price')
+        self.average_price = float(average_price) if average_price else None
+        self.filled_quantity = int(get('filled_quantity', 0))
+        pending_quantity = get('pending_quantity')
+        self.pending_quantity = int(pending_quantity) if pending_quantity is not None else None
+        self.cancelled_quantity = int(get('cancelled_quantity', 0))
+        self._str_cache = None
     
     def __str__(self) -> str:
         """String representation of the order"""
+        if self._str_cache is not None:
+            return self._str_cache
+        
         price_str = f" @ {self.price}" if self.price else ""
         trigger_str = f" (Trigger: {self.trigger_price})" if self.trigger_price else ""
-        return f"Order {self.order_id}: {self.transaction_type} {self.quantity} {self.symbol} {self.order_type}{price_str}{trigger_str} - {self.status}"
\ No newline at end of file
+        self._str_cache = f"Order {self.order_id}: {self.transaction_type} {self.quantity} {self.symbol} {self.order_type}{price_str}{trigger_str} - {self.status}"
+        return self._str_cache
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Batch parsing of orders from raw API response bodies
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from src.models.order import Order
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Decoder for response bodies; orjson parses bytes directly, in C, when installed
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def parse_orders(records: List[Dict[str, Any]], pool: Optional[Dict[str, Order]] = None) -> List[Order]:
+    """
+    Create orders from a list of API order records
+    
+    Orders already in pool (keyed by order ID) are updated in place and reused
+    instead of allocating new ones.
+    """
+    from_api_response = Order.from_api_response
+    if not pool:
+        return [from_api_response(record) for record in records]
+    
+    orders = []
+    for record in records:
+        order = pool.get(record.get('order_id', ''))
+        if order is None:
+            order = from_api_response(record)
+        else:
+            order.update_from_api_response(record)
+        orders.append(order)
+    
+    return orders
+
+
+def parse_orders_bytes(buf: bytes, pool: Optional[Dict[str, Order]] = None) -> List[Order]:
+    """
+    Create orders from a raw order book response body
+    
+    Accepts either the API envelope ({"status": ..., "data": [...]}) or a bare
+    list of order records. Orders already in pool are updated in place and
+    reused. Raises ValueError if the body is not valid JSON.
+    """
+    payload = _loads(buf)
+    records = payload.get('data', []) if isinstance(payload, dict) else payload
+    
+    if not isinstance(records, list):
+        return []
+    
+    return parse_orders(records, pool)
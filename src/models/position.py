@@ -2,11 +2,13 @@
 Position data model
 """
 
-from dataclasses import dataclass
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
 
+from src.models._strings import intern_string
 
-@dataclass
+
+@dataclass(slots=True)
 class Position:
     """Model representing a trading position"""
     
@@ -22,11 +24,16 @@ class Position:
     last_price: float
     unrealized_pnl: float
     realized_pnl: float
+    # Realized + unrealized P&L, kept current by whoever updates either component
+    total_pnl: float = field(init=False)
+    _abs_qty: int = field(init=False, repr=False, compare=False)
+    # Rendered string, cleared whenever the quantity, prices or P&L change
+    _str_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
-    @property
-    def total_pnl(self) -> float:
-        """Calculate total P&L (realized + unrealized)"""
-        return self.realized_pnl + self.unrealized_pnl
+    def __post_init__(self):
+        """Compute the derived P&L total and absolute quantity"""
+        self.total_pnl = self.realized_pnl + self.unrealized_pnl
+        self._abs_qty = abs(self.quantity)
     
     @property
     def is_long(self) -> bool:
@@ -41,22 +48,36 @@ class Position:
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'Position':
         """Create a position from API response data"""
-        return cls(
-            instrument_key=data.get('instrument_key', ''),
-            exchange=data.get('exchange', ''),
-            symbol=data.get('symbol', ''),
-            product=data.get('product', ''),
-            quantity=int(data.get('quantity', 0)),
-            overnight_quantity=int(data.get('overnight_quantity', 0)),
-            multiplier=float(data.get('multiplier', 1)),
-            average_price=float(data.get('average_price', 0)),
-            close_price=float(data.get('close_price', 0)),
-            last_price=float(data.get('last_price', 0)),
-            unrealized_pnl=float(data.get('unrealized_pnl', 0)),
-            realized_pnl=float(data.get('realized_pnl', 0))
-        )
+        # Allocate without __init__ and fill the slots directly, which skips
+        # keyword argument binding for every parsed record
+        position = object.__new__(cls)
+        position.update_from_api_response(data)
+        return position
+    
+    def update_from_api_response(self, data: Dict[str, Any]):
+        """Update this position in place from API response data"""
+        get = data.get
+        self.instrument_key = intern_string(get('instrument_key', ''))
+        self.exchange = intern_string(get('exchange', ''))
+        self.symbol = get('symbol', '')
+        self.product = intern_string(get('product', ''))
+        self.quantity = int(get('quantity', 0))
+        self._abs_qty = abs(self.quantity)
+        self.overnight_quantity = int(get('overnight_quantity', 0))
+        self.multiplier = float(get('multiplier', 1))
+        self.average_price = float(get('average_price', 0))
+        self.close_price = float(get('close_price', 0))
+        self.last_price = float(get('last_price', 0))
+        self.unrealized_pnl = float(get('unrealized_pnl', 0))
+        self.realized_pnl = float(get('realized_pnl', 0))
+        self.total_pnl = self.realized_pnl + self.unrealized_pnl
+        self._str_cache = None
     
     def __str__(self) -> str:
         """String representation of the position"""
+        if self._str_cache is not None:
+            return self._str_cache
+        
         position_type = "LONG" if self.is_long else "SHORT" if self.is_short else "FLAT"
-        return f"{position_type} {abs(self.quantity)} {self.symbol} @ {self.average_price} (P&L: ₹{self.total_pnl:.2f})"
\ No newline at end of file
+        self._str_cache = f"{position_type} {self._abs_qty} {self.symbol} @ {self.average_price} (P&L: ₹{self.total_pnl:.2f})"
+        return self._str_cache
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Decoding of positions from raw API response bodies
+"""
+
+from typing import Any, Dict, List
+
+from src.models.order_parser import _loads
+
+
+def parse_position_records(buf: bytes) -> List[Dict[str, Any]]:
+    """
+    Extract position records from a raw positions response body
+    
+    Accepts the API envelope ({"status": ..., "data": ...}) with data either a
+    list of records or a dict holding them by category, or a bare list of
+    records. Raises ValueError if the body is not valid JSON.
+    """
+    payload = _loads(buf)
+    data = payload.get('data', {}) if isinstance(payload, dict) else payload
+    
+    if isinstance(data, list):
+        # Direct list of positions
+        return data
+    
+    if not isinstance(data, dict):
+        return []
+    
+    # For the new API format that might return categories of positions
+    for category in ('short_term_positions', 'day_positions', 'holdings', 'positions'):
+        if category in data:
+            return list(data[category])
+    
+    # If data itself maps keys to positions
+    if data and isinstance(next(iter(data.values())), dict):
+        return list(data.values())
+    
+    return []
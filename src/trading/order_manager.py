@@ -2,23 +2,49 @@
 Order management system
 """
 
+import threading
 import time
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Set, Tuple
 
 from src.api.upstox_client import UpstoxClient
 from src.models.order import Order
+from src.models.order_parser import parse_orders_bytes
 from src.models.instrument import Instrument
+from src.trading.poller import Poller, get_shared_poller
+from src.utils.callbacks import validate_callback
 from src.utils.logger import logger
 
 class OrderManager:
     """Manages order placement, modification, and tracking"""
     
+    # Delay for coalescing order book refreshes requested by a burst of actions
+    REFRESH_DEBOUNCE = 0.05
+    # Age after which the order cache is refetched for an unknown order
+    ORDER_CACHE_TTL = 1.0
+    
     def __init__(self, client: UpstoxClient):
         """Initialize with API client"""
         self.client = client
         self.orders: Dict[str, Order] = {}
-        self.order_callbacks: Dict[str, List[Callable[[Order], None]]] = {}
+        # Callback tuples are replaced on register rather than mutated, so dispatch
+        # can iterate them while another thread registers callbacks
+        self.order_callbacks: Dict[str, Tuple[Callable[[Order], None], ...]] = {}
+        # Serializes the rebuilds only; readers never take it
+        self._callbacks_lock = threading.Lock()
         self.default_quantity = 1
+        
+        # IDs of orders that are new or changed status/fill since the last poll
+        self._changed_order_ids: Set[str] = set()
+        # Guards updating tracked orders and the changed IDs, since the poller, the
+        # debounced refresh and get_order can all fetch at once
+        self._orders_lock = threading.Lock()
+        
+        # Debounced order book refresh after placing, modifying or cancelling orders
+        self._refresh_pending = threading.Event()
+        # One-shot timer per burst, so no thread outlives the refresh it serves
+        self._refresh_timer: Optional[threading.Timer] = None
+        self._refresh_timer_lock = threading.Lock()
+        self._last_fetch = float('-inf')
     
     def set_default_quantity(self, quantity: int):
         """Set default order quantity"""
@@ -26,24 +52,56 @@ class OrderManager:
     
     def fetch_orders(self) -> List[Order]:
         """Fetch current orders from API"""
-        response = self.client.get_order_book()
+        # This fetch serves any pending debounced refresh; one requested while it runs stays pending
+        was_pending = self._refresh_pending.is_set()
+        self._refresh_pending.clear()
+        started = time.monotonic()
         
-        if response.get('status') == 'error':
+        orders = None
+        try:
+            orders = self._fetch_order_book()
+        finally:
+            if orders is not None:
+                self._last_fetch = started
+            elif was_pending:
+                # Nothing was refreshed, so the cache stays stale until a fetch succeeds
+                self._refresh_pending.set()
+        
+        return orders if orders is not None else []
+    
+    def _fetch_order_book(self) -> Optional[List[Order]]:
+        """Fetch and apply the order book, returning None if it could not be fetched or parsed"""
+        # Fetch the raw body so it is decoded straight into orders in one pass
+        response = self.client.get_order_book(raw=True)
+        
+        if isinstance(response, dict):
             logger.error(f"Failed to fetch orders: {response.get('message')}")
-            return []
+            return None
         
-        orders = []
-        for order_data in response.get('data', []):
-            order = Order.from_api_response(order_data)
-            self.orders[order.order_id] = order
-            orders.append(order)
+        with self._orders_lock:
+            # Snapshot the state callbacks care about, since tracked orders are updated in place
+            previous = {order_id: (order.status, order.filled_quantity) for order_id, order in self.orders.items()}
+            
+            # Orders already being tracked are updated in place rather than replaced
+            try:
+                orders = parse_orders_bytes(response, pool=self.orders)
+            except ValueError as e:
+                logger.error(f"Failed to parse orders: {e}")
+                return None
+            
+            changed_ids = self._changed_order_ids
+            for order in orders:
+                self.orders[order.order_id] = order
+                if previous.get(order.order_id) != (order.status, order.filled_quantity):
+                    changed_ids.add(order.order_id)
         
         return orders
     
     def get_order(self, order_id: str) -> Optional[Order]:
         """Get an order by ID"""
-        # If not in local cache, try to fetch from API
-        if order_id not in self.orders:
+        # If not in local cache, fetch from API unless the cache is fresh and up to date
+        if order_id not in self.orders and (
+                self._refresh_pending.is_set() or time.monotonic() - self._last_fetch > self.ORDER_CACHE_TTL):
             self.fetch_orders()
         
         return self.orders.get(order_id)
@@ -179,44 +237,64 @@ class OrderManager:
         return True
     
     def _fetch_order_details(self, order_id: str) -> Optional[Order]:
-        """Fetch details for a specific order"""
-        # We need to fetch all orders since Upstox API doesn't have a single order fetch endpoint
-        orders = self.fetch_orders()
-        return self.get_order(order_id)
+        """Schedule a refresh of the order book and return the cached order"""
+        # Upstox API doesn't have a single order fetch endpoint, so refreshes requested
+        # by a burst of actions are coalesced into one fetch of all orders
+        self._refresh_pending.set()
+        
+        with self._refresh_timer_lock:
+            if self._refresh_timer is None:
+                self._refresh_timer = threading.Timer(self.REFRESH_DEBOUNCE, self._debounced_refresh)
+                self._refresh_timer.daemon = True
+                self._refresh_timer.start()
+        
+        return self.orders.get(order_id)
+    
+    def _debounced_refresh(self):
+        """Fetch orders once for a burst of refresh requests"""
+        # Requests from here on start a new timer, so none are missed during the fetch
+        with self._refresh_timer_lock:
+            self._refresh_timer = None
+        
+        # Skip if a direct fetch already served the request meanwhile
+        if not self._refresh_pending.is_set():
+            return
+        
+        try:
+            self.fetch_orders()
+        except Exception as e:
+            logger.error(f"Error refreshing orders: {e}")
     
-    def register_order_callback(self, order_id: str, callback: Callable[[Order], None]):
+    def register_order_callback(self, order_id: str, callback: Callable[[Order], None]) -> bool:
         """Register a callback for order updates"""
-        if order_id not in self.order_callbacks:
-            self.order_callbacks[order_id] = []
+        if not validate_callback(callback):
+            return False
         
-        self.order_callbacks[order_id].append(callback)
+        with self._callbacks_lock:
+            self.order_callbacks[order_id] = self.order_callbacks.get(order_id, ()) + (callback,)
+        return True
     
-    def start_order_monitoring(self, refresh_interval: float = 5.0):
-        """Start monitoring orders in a background thread"""
-        import threading
+    def poll_orders(self):
+        """Fetch orders once and trigger the callbacks of orders that changed"""
+        self.fetch_orders()
+        
+        # Swap under the lock so IDs added by a concurrent fetch are not lost
+        with self._orders_lock:
+            changed_ids, self._changed_order_ids = self._changed_order_ids, set()
         
-        def monitor_loop():
-            while True:
+        # Trigger callbacks only for orders that are new or changed, isolating each
+        # so one that raises doesn't skip the rest
+        for order_id in changed_ids:
+            order = self.orders[order_id]
+            for callback in self.order_callbacks.get(order_id, ()):
                 try:
-                    orders = self.fetch_orders()
-                    
-                    # Trigger callbacks for orders with registered callbacks
-                    for order_id, callbacks in self.order_callbacks.items():
-                        if order_id in self.orders:
-                            order = self.orders[order_id]
-                            for callback in callbacks:
-                                try:
-                                    callback(order)
-                                except Exception as e:
-                                    logger.error(f"Error in order callback: {e}")
-                    
-                    # Sleep until next check
-                    time.sleep(refresh_interval)
+                    callback(order)
                 except Exception as e:
-                    logger.error(f"Error in order monitoring: {e}")
-                    time.sleep(refresh_interval)
-        
-        # Start monitoring thread
-        monitor_thread = threading.Thread(target=monitor_loop)
-        monitor_thread.daemon = True
-        monitor_thread.start()
\ No newline at end of file
+                    logger.error(f"Error in order callback: {e}")
+    
+    def start_order_monitoring(self, refresh_interval: float = 5.0, poller: Optional[Poller] = None):
+        """Start monitoring orders on a poller (default: the shared poller)"""
+        # Poll from the shared background loop rather than a thread of our own
+        poller = poller or get_shared_poller()
+        poller.add_job(self.poll_orders, refresh_interval)
+        poller.start()
\ No newline at end of file
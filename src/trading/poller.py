@@ -0,0 +1,154 @@
+"""
+Shared polling loop for order and position updates
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from src.utils.logger import logger
+
+class Poller:
+    """Runs periodic poll jobs from one background loop, overlapping their API requests"""
+    
+    def __init__(self, refresh_interval: float = 5.0):
+        """Initialize with the interval between polls in seconds"""
+        self.refresh_interval = refresh_interval
+        self._jobs: List[Callable[[], None]] = []
+        # Per-job interval and next due time (monotonic), for jobs on their own schedule
+        self._intervals: Dict[Callable[[], None], float] = {}
+        self._next_due: Dict[Callable[[], None], float] = {}
+        # Guards the job tables, which add_job/remove_job change from other threads
+        self._lock = threading.Lock()
+        self._jobs_changed = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_workers = 0
+    
+    def add_job(self, job: Callable[[], None], interval: Optional[float] = None):
+        """
+        Add a poll job, e.g. OrderManager.poll_orders or PositionTracker.poll_positions
+        
+        The job runs every interval seconds (default: the poller's refresh interval),
+        starting on the next pass of the loop.
+        """
+        with self._lock:
+            self._intervals[job] = interval if interval is not None else self.refresh_interval
+            self._next_due[job] = time.monotonic()
+            self._jobs = self._jobs + [job]
+        self._jobs_changed.set()
+    
+    def remove_job(self, job: Callable[[], None]):
+        """Remove a poll job"""
+        with self._lock:
+            if job in self._intervals:
+                self._jobs = [existing for existing in self._jobs if existing != job]
+                del self._intervals[job]
+                del self._next_due[job]
+    
+    def wake(self, job: Callable[[], None]):
+        """Run a job on the loop's next pass instead of waiting out its interval"""
+        with self._lock:
+            if job not in self._next_due:
+                return
+            self._next_due[job] = time.monotonic()
+        self._jobs_changed.set()
+    
+    def poll_once(self):
+        """Run every job once, concurrently, and wait for all of them to finish"""
+        with self._lock:
+            jobs = list(self._jobs)
+        self._run_jobs(jobs)
+    
+    def _run_jobs(self, jobs: List[Callable[[], None]]):
+        """Run the given jobs concurrently and wait for all of them to finish"""
+        if not jobs:
+            return
+        
+        # A single job runs inline; several share a pool so their HTTP requests overlap
+        if len(jobs) == 1:
+            self._run_job(jobs[0])
+            return
+        
+        if self._executor is None or self._executor_workers < len(jobs):
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="poller")
+            self._executor_workers = len(jobs)
+        
+        for future in [self._executor.submit(self._run_job, job) for job in jobs]:
+            future.result()
+    
+    def _run_job(self, job: Callable[[], None]):
+        """Run one job, logging rather than propagating its errors"""
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Error in poll job: {e}")
+    
+    def start(self):
+        """Start polling in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+    
+    def _poll_loop(self):
+        """Poll until stopped, running each job when it is due and sleeping until the next one"""
+        while not self._stop_event.is_set():
+            # Cleared before scheduling so a job added or woken meanwhile is not missed
+            self._jobs_changed.clear()
+            
+            try:
+                timeout = self._poll_due_jobs()
+            except Exception as e:
+                # Keep the shared loop alive, since every order and position poll runs on it
+                logger.error(f"Error in poll loop: {e}")
+                timeout = self.refresh_interval
+            
+            # Sleep until the next job is due, waking early for new jobs or stop
+            self._jobs_changed.wait(timeout)
+    
+    def _poll_due_jobs(self) -> float:
+        """Run the jobs that are due and return the time in seconds until the next one is"""
+        now = time.monotonic()
+        with self._lock:
+            due = [job for job in self._jobs if self._next_due.get(job, now) <= now]
+            for job in due:
+                self._next_due[job] = now + self._intervals[job]
+        
+        self._run_jobs(due)
+        
+        with self._lock:
+            next_due = min(self._next_due.values(), default=time.monotonic() + self.refresh_interval)
+        return max(next_due - time.monotonic(), 0.0)
+    
+    def stop(self):
+        """Stop polling"""
+        self._stop_event.set()
+        self._jobs_changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._executor_workers = 0
+
+# Poller shared by the order and position monitors, so they run from one background loop
+_shared_poller: Optional[Poller] = None
+_shared_poller_lock = threading.Lock()
+
+def get_shared_poller() -> Poller:
+    """Get the process-wide poller, creating it on first use"""
+    global _shared_poller
+    
+    with _shared_poller_lock:
+        if _shared_poller is None:
+            _shared_poller = Poller()
+        return _shared_poller
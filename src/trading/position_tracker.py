@@ -4,25 +4,46 @@ Position tracking system
 
 import threading
 import time
-from typing import Dict, List, Callable, Optional, Set
+from typing import Dict, List, Callable, Optional, Set, Tuple
 
 from src.api.upstox_client import UpstoxClient
 from src.models.position import Position
+from src.models.position_parser import parse_position_records
 from src.models.instrument import Instrument
+from src.trading.poller import Poller, get_shared_poller
+from src.utils.callbacks import validate_callback
 from src.utils.logger import logger
 
 class PositionTracker:
     """Tracks and manages trading positions"""
     
+    # Age after which the positions are refetched for an unknown instrument
+    POSITION_CACHE_TTL = 5.0
+    
+    # Number of locks the positions are striped across by instrument key
+    LOCK_STRIPES = 16
+    
     def __init__(self, client: UpstoxClient):
         """Initialize with API client"""
         self.client = client
         self.positions: Dict[str, Position] = {}
-        self.position_callbacks: Dict[str, List[Callable[[Position], None]]] = {}
-        self.global_callbacks: List[Callable[[Dict[str, Position]], None]] = []
+        # Callback tuples are replaced on register/unregister rather than mutated,
+        # so dispatch can iterate them while another thread registers callbacks
+        self.position_callbacks: Dict[str, Tuple[Callable[[Position], None], ...]] = {}
+        self.global_callbacks: Tuple[Callable[[Dict[str, Position]], None], ...] = ()
+        # Serializes the rebuilds only; readers never take it
+        self._callbacks_lock = threading.Lock()
         self.monitoring = False
-        self.monitoring_thread = None
+        self.poller: Optional[Poller] = None
         self.subscribed_instruments: Set[str] = set()
+        self._positions_fetched_at = float('-inf')
+        
+        # Copy of positions replaced as a whole after each fetch, so the tick handler
+        # and callbacks read a consistent dict that is never mutated under them
+        self._positions_snapshot: Dict[str, Position] = {}
+        # Guard the pricing fields of positions written by both fetches and ticks,
+        # striped by instrument key so ticks for unrelated instruments don't contend
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
     
     def fetch_positions(self) -> List[Position]:
         """Fetch current positions from API"""
@@ -32,86 +53,138 @@ class PositionTracker:
                 logger.error("Cannot fetch positions: Authentication failed")
                 return []
         
-        response = self.client.get_positions()
+        # Fetch the raw body so it is decoded in one pass (natively when orjson is installed)
+        response = self.client.get_positions(raw=True)
         
-        if response.get('status') == 'error':
-            logger.error(f"Failed to fetch positions: {response.get('message')}")
+        if isinstance(response, dict):
+            logger.error("Failed to fetch positions: %s", response.get('message'))
             return []
         
-        positions = []
+        try:
+            positions_data = parse_position_records(response)
+        except ValueError as e:
+            logger.error("Failed to parse positions: %s", e)
+            return []
         
-        # Handle the new response format for positions
-        data = response.get('data', {})
-        positions_data = []
+        self._positions_fetched_at = time.monotonic()
         
-        # Check if the data is in the expected format
-        if isinstance(data, dict):
-            # For the new API format that might return categories of positions
-            if 'short_term_positions' in data:
-                positions_data.extend(data['short_term_positions'])
-            elif 'day_positions' in data:
-                positions_data.extend(data['day_positions'])
-            elif 'holdings' in data:
-                positions_data.extend(data['holdings'])
-            # If positions are directly in data
-            elif 'positions' in data:
-                positions_data.extend(data['positions'])
-            # If data itself is the positions list
-            elif len(data) > 0 and isinstance(list(data.values())[0], dict):
-                positions_data.extend(data.values())
-        elif isinstance(data, list):
-            # Direct list of positions
-            positions_data = data
+        positions = []
+        new_keys = []
         
         for position_data in positions_data:
             try:
-                position = Position.from_api_response(position_data)
+                # Positions already being tracked are updated in place rather than replaced
+                position = self.positions.get(position_data.get('instrument_key', ''))
+                if position is None:
+                    position = Position.from_api_response(position_data)
+                else:
+                    with self._lock(position.instrument_key):
+                        position.update_from_api_response(position_data)
                 
                 # Only store/return non-zero positions unless already tracking
                 if position.quantity != 0 or position.instrument_key in self.positions:
                     self.positions[position.instrument_key] = position
                     positions.append(position)
                     
-                    # Add to subscribed instruments for live updates
+                    # Collect new instruments to subscribe to for live updates
                     if position.quantity != 0 and position.instrument_key not in self.subscribed_instruments:
-                        self.subscribed_instruments.add(position.instrument_key)
-                        try:
-                            # Ensure WebSocket is connected before subscribing
-                            if not self.client.ws_connected:
-                                self.client.connect_websocket()
-                                # Give it a moment to connect
-                                time.sleep(1)
-                            
-                            if self.client.ws_connected:
-                                self.client.subscribe_feeds([position.instrument_key])
-                        except Exception as e:
-                            logger.error(f"Failed to subscribe to feed: {e}")
+                        new_keys.append(position.instrument_key)
             except Exception as e:
-                logger.error(f"Error processing position data: {e}")
+                logger.error("Error processing position data: %s", e)
+        
+        self._positions_snapshot = dict(self.positions)
+        
+        # Subscribe to all new instruments in a single request
+        if new_keys:
+            try:
+                # Ensure WebSocket is connected before subscribing; connecting
+                # blocks until the feed is authenticated or times out
+                if not self.client.ws_connected:
+                    self.client.connect_websocket()
+                
+                # Keys are only recorded once subscribed, so a failed request is retried next fetch
+                if self.client.ws_connected and self.client.subscribe_feeds(new_keys):
+                    self.subscribed_instruments.update(new_keys)
+            except Exception as e:
+                logger.error("Failed to subscribe to feeds: %s", e)
         
         return positions
     
+    def _lock(self, instrument_key: str) -> threading.Lock:
+        """Get the lock stripe guarding an instrument's position"""
+        return self._stripes[hash(instrument_key) % self.LOCK_STRIPES]
+    
     def get_position(self, instrument_key: str) -> Optional[Position]:
         """Get a position by instrument key"""
-        # If not in local cache, try to fetch from API
-        if instrument_key not in self.positions:
+        position = self.positions.get(instrument_key)
+        
+        # If not in local cache, fetch from API unless the cache is fresh, in which
+        # case there is no such position; lookups for many instruments share one fetch
+        if position is None and time.monotonic() - self._positions_fetched_at > self.POSITION_CACHE_TTL:
             self.fetch_positions()
+            position = self.positions.get(instrument_key)
         
-        return self.positions.get(instrument_key)
+        return position
     
-    def register_position_callback(self, instrument_key: str, callback: Callable[[Position], None]):
+    def register_position_callback(self, instrument_key: str, callback: Callable[[Position], None]) -> bool:
         """Register a callback for position updates"""
-        if instrument_key not in self.position_callbacks:
-            self.position_callbacks[instrument_key] = []
+        if not validate_callback(callback):
+            return False
         
-        self.position_callbacks[instrument_key].append(callback)
+        with self._callbacks_lock:
+            self.position_callbacks[instrument_key] = self.position_callbacks.get(instrument_key, ()) + (callback,)
+        return True
+    
+    def unregister_position_callback(self, instrument_key: str, callback: Callable[[Position], None]) -> bool:
+        """Unregister a callback for position updates"""
+        with self._callbacks_lock:
+            callbacks = self.position_callbacks.get(instrument_key, ())
+            if callback not in callbacks:
+                return False
+            
+            remaining = tuple(existing for existing in callbacks if existing != callback)
+            if remaining:
+                self.position_callbacks[instrument_key] = remaining
+            else:
+                del self.position_callbacks[instrument_key]
+        return True
     
-    def register_global_callback(self, callback: Callable[[Dict[str, Position]], None]):
+    def register_global_callback(self, callback: Callable[[Dict[str, Position]], None]) -> bool:
         """Register a callback for all position updates"""
-        self.global_callbacks.append(callback)
+        if not validate_callback(callback):
+            return False
+        
+        with self._callbacks_lock:
+            self.global_callbacks = self.global_callbacks + (callback,)
+        return True
+    
+    def poll_positions(self):
+        """Fetch positions once and trigger the position and global callbacks"""
+        self.fetch_positions()
+        snapshot = self._positions_snapshot
+        
+        # Trigger callbacks for positions with registered callbacks, isolating each
+        # so one that raises doesn't skip the rest
+        position_callbacks = self.position_callbacks
+        for instrument_key, position in snapshot.items():
+            callbacks = position_callbacks.get(instrument_key)
+            if callbacks:
+                for callback in callbacks:
+                    try:
+                        callback(position)
+                    except Exception as e:
+                        logger.error("Error in position callback: %s", e)
+        
+        # Trigger global callbacks
+        for callback in self.global_callbacks:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error("Error in global position callback: %s", e)
     
-    def start_monitoring(self, refresh_interval: float = 5.0, max_retries: int = 3):
-        """Start monitoring positions in a background thread"""
+    def start_monitoring(self, refresh_interval: float = 5.0, max_retries: int = 3,
+                         poller: Optional[Poller] = None):
+        """Start monitoring positions on a poller (default: the shared poller)"""
         if self.monitoring:
             return True
         
@@ -122,7 +195,7 @@ class PositionTracker:
                     if not self.client.authenticator.authenticate():
                         logger.error("Cannot start position monitoring: Authentication failed")
                         if retry < max_retries - 1:
-                            logger.info(f"Retrying authentication ({retry+1}/{max_retries})")
+                            logger.info("Retrying authentication (%d/%d)", retry + 1, max_retries)
                             time.sleep(2)  # Wait before retrying
                             continue
                         return False
@@ -130,9 +203,9 @@ class PositionTracker:
                 # Test API access before starting monitoring
                 test_response = self.client.get_profile()
                 if isinstance(test_response, dict) and test_response.get('status') == 'error':
-                    logger.error(f"API access test failed: {test_response.get('message')}")
+                    logger.error("API access test failed: %s", test_response.get('message'))
                     if retry < max_retries - 1:
-                        logger.info(f"Retrying API access test ({retry+1}/{max_retries})")
+                        logger.info("Retrying API access test (%d/%d)", retry + 1, max_retries)
                         time.sleep(2)
                         continue
                     return False
@@ -140,54 +213,32 @@ class PositionTracker:
                 # API access successful, proceed with monitoring
                 break
             except Exception as e:
-                logger.error(f"Error testing API access: {e}")
+                logger.error("Error testing API access: %s", e)
                 if retry < max_retries - 1:
-                    logger.info(f"Retrying ({retry+1}/{max_retries})")
+                    logger.info("Retrying (%d/%d)", retry + 1, max_retries)
                     time.sleep(2)
                     continue
                 return False
                     
         self.monitoring = True
         
-        def monitor_loop():
-            while self.monitoring:
-                try:
-                    positions = self.fetch_positions()
-                    
-                    # Trigger callbacks for positions with registered callbacks
-                    for instrument_key, callbacks in self.position_callbacks.items():
-                        if instrument_key in self.positions:
-                            position = self.positions[instrument_key]
-                            for callback in callbacks:
-                                try:
-                                    callback(position)
-                                except Exception as e:
-                                    logger.error(f"Error in position callback: {e}")
-                    
-                    # Trigger global callbacks
-                    for callback in self.global_callbacks:
-                        try:
-                            callback(self.positions)
-                        except Exception as e:
-                            logger.error(f"Error in global position callback: {e}")
-                    
-                    # Sleep until next check
-                    time.sleep(refresh_interval)
-                except Exception as e:
-                    logger.error(f"Error in position monitoring: {e}")
-                    time.sleep(refresh_interval)
-        
-        # Start monitoring thread
-        self.monitoring_thread = threading.Thread(target=monitor_loop)
-        self.monitoring_thread.daemon = True
-        self.monitoring_thread.start()
+        # Poll from the shared background loop rather than a thread of our own
+        self.poller = poller or get_shared_poller()
+        self.poller.add_job(self.poll_positions, refresh_interval)
+        self.poller.start()
         return True
     
+    def request_refresh(self):
+        """Poll positions now rather than at the next interval, e.g. after an order fill"""
+        if self.poller:
+            self.poller.wake(self.poll_positions)
+    
     def stop_monitoring(self):
         """Stop monitoring positions"""
         self.monitoring = False
-        if self.monitoring_thread:
-            self.monitoring_thread.join(timeout=1.0)
+        if self.poller:
+            self.poller.remove_job(self.poll_positions)
+            self.poller = None
     
     def setup_live_updates(self):
         """Setup live market data updates for positions"""
@@ -203,38 +254,41 @@ class PositionTracker:
         # Register websocket callback for position updates
         def on_tick_data(data):
             instrument_key = data.get('instrument_key')
-            if not instrument_key or instrument_key not in self.positions:
+            # Read the snapshot reference once; fetches replace it rather than mutate it
+            snapshot = self._positions_snapshot
+            position = snapshot.get(instrument_key) if instrument_key else None
+            if position is None:
                 return
             
-            position = self.positions[instrument_key]
-            
-            # Update last price and unrealized P&L
+            # Update last price and unrealized P&L; a repeat of the last price changes
+            # nothing, so it is dropped before locking or dispatching callbacks
             ltp = data.get('ltp')
-            if ltp:
-                # Calculate new unrealized P&L
-                old_last_price = position.last_price
-                position.last_price = ltp
-                
-                # Update unrealized P&L based on price change
-                if position.quantity != 0:
-                    price_diff = position.last_price - position.average_price
-                    position.unrealized_pnl = price_diff * position.quantity * position.multiplier
+            if ltp and ltp != position.last_price:
+                with self._lock(instrument_key):
+                    position.last_price = ltp
+                    position._str_cache = None
+                    
+                    # Update unrealized P&L based on price change
+                    if position.quantity != 0:
+                        price_diff = position.last_price - position.average_price
+                        position.unrealized_pnl = price_diff * position.quantity * position.multiplier
+                        position.total_pnl = position.realized_pnl + position.unrealized_pnl
                 
                 # Trigger callbacks for this position
-                if instrument_key in self.position_callbacks:
-                    for callback in self.position_callbacks[instrument_key]:
+                callbacks = self.position_callbacks.get(instrument_key)
+                if callbacks:
+                    for callback in callbacks:
                         try:
                             callback(position)
                         except Exception as e:
-                            logger.error(f"Error in position tick callback: {e}")
+                            logger.error("Error in position tick callback: %s", e)
                 
-                # Trigger global callbacks if price changed
-                if old_last_price != position.last_price:
-                    for callback in self.global_callbacks:
-                        try:
-                            callback(self.positions)
-                        except Exception as e:
-                            logger.error(f"Error in global tick callback: {e}")
+                # Trigger global callbacks
+                for callback in self.global_callbacks:
+                    try:
+                        callback(snapshot)
+                    except Exception as e:
+                        logger.error("Error in global tick callback: %s", e)
         
         # Register the callback with the API client
         self.client.register_callback('full', on_tick_data)
@@ -245,8 +299,8 @@ class PositionTracker:
             if not self.client.connect_websocket():
                 logger.error("Failed to connect WebSocket")
                 return False
-            # Give it a moment to connect
-            time.sleep(1)
+            # Wait for the feed to be authenticated before subscribing
+            self.client.ws_connected_event.wait(timeout=5)
         
         # Subscribe to feeds for all current positions
         instrument_keys = [pos.instrument_key for pos in self.positions.values() if pos.quantity != 0]
@@ -260,7 +314,7 @@ class PositionTracker:
                     logger.error("Failed to subscribe to position feeds")
                     return False
             except Exception as e:
-                logger.error(f"Failed to subscribe to position feeds: {e}")
+                logger.error("Failed to subscribe to position feeds: %s", e)
                 return False
         
         return True
\ No newline at end of file
@@ -2,9 +2,12 @@
 MACD (Moving Average Convergence Divergence) trading strategy
 """
 
-import numpy as np
+from dataclasses import dataclass
 from typing import Dict, List, Any, Optional
 
+import numpy as np
+import pandas as pd
+
 from src.api.upstox_client import UpstoxClient
 from src.models.instrument import Instrument
 from src.models.position import Position
@@ -15,6 +18,60 @@ from src.trading.strategy import TradingStrategy
 from src.utils.logger import logger
 from src.utils.persistence import save_strategy_settings, load_strategy_settings
 
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+
+def _calculate_ema(data: np.ndarray, period: int) -> np.ndarray:
+    """
+    Calculate the Exponential Moving Average of a whole series at once
+    
+    Seeded with the SMA of the first period values, as the per-tick update is;
+    values before the seed are NaN. The recurrence runs in C, via scipy's
+    lfilter when installed and pandas' ewm otherwise.
+    """
+    ema = np.full(len(data), np.nan)
+    if len(data) < period:
+        return ema
+    
+    multiplier = 2 / (period + 1)
+    seed = data[:period].mean()
+    ema[period - 1] = seed
+    
+    if lfilter is not None:
+        # y[n] = multiplier * x[n] + (1 - multiplier) * y[n-1], starting from the seed
+        ema[period:], _ = lfilter([multiplier], [1.0, multiplier - 1.0], data[period:],
+                                  zi=[seed * (1.0 - multiplier)])
+    else:
+        values = data[period - 1:].copy()
+        values[0] = seed
+        ema[period - 1:] = pd.Series(values).ewm(alpha=multiplier, adjust=False).mean().to_numpy()
+    
+    return ema
+
+
+@dataclass(slots=True)
+class _MacdState:
+    """Per-instrument MACD state, alongside the instrument's row of the strategy's EMA arrays"""
+    
+    instrument: Instrument
+    # Row of the instrument in the strategy's EMA arrays
+    row: int
+    price_count: int = 0
+    macd_count: int = 0
+    
+    # Running sums seeding each EMA with the SMA of its first period values
+    fast_seed: float = 0.0
+    slow_seed: float = 0.0
+    signal_seed: float = 0.0
+    
+    # Set once all three EMAs are seeded, from when ticks can be applied in batches
+    ready: bool = False
+    
+    position_side: int = 0  # 1 long, -1 short, 0 flat
+
 
 class MACDStrategy(TradingStrategy):
     """
@@ -28,6 +85,13 @@ class MACDStrategy(TradingStrategy):
     - Sell when MACD line crosses below the Signal line
     """
     
+    __slots__ = ('fast_period', 'slow_period', 'signal_period', 'quantity',
+                 '_fast_k', '_slow_k', '_signal_k',
+                 'fast_ema', 'slow_ema', 'signal_ema', 'macd_line', 'crossover', 'state')
+    
+    # Ready instruments in a tick batch below which updating them one at a time is cheaper
+    BATCH_VECTORIZE_MIN = 8
+    
     def initialize(self):
         """Initialize the strategy"""
         # Get strategy parameters with defaults
@@ -36,32 +100,35 @@ class MACDStrategy(TradingStrategy):
         self.signal_period = int(self.get_parameter('signal_period', 9))
         self.quantity = int(self.get_parameter('quantity', 1))
         
-        # Initialize data storage for each instrument
-        self.prices: Dict[str, List[float]] = {}
-        self.macd_line: Dict[str, Optional[float]] = {}
-        self.signal_line: Dict[str, Optional[float]] = {}
-        self.position_side: Dict[str, str] = {}  # 'LONG', 'SHORT', or None
-        self.previous_crossover: Dict[str, str] = {}  # 'ABOVE', 'BELOW', or None
-        
-        # Initialize state for each instrument
-        for instrument_key in self.instruments:
-            self.prices[instrument_key] = []
-            self.macd_line[instrument_key] = None
-            self.signal_line[instrument_key] = None
-            self.position_side[instrument_key] = None
-            self.previous_crossover[instrument_key] = None
+        # EMA multipliers
+        self._fast_k = 2 / (self.fast_period + 1)
+        self._slow_k = 2 / (self.slow_period + 1)
+        self._signal_k = 2 / (self.signal_period + 1)
+        
+        # EMA state of all instruments in parallel arrays, one row per instrument, so
+        # a batch of ticks is applied in one vectorized pass; NaN until seeded
+        n_instruments = len(self.instruments)
+        self.fast_ema = np.full(n_instruments, np.nan)
+        self.slow_ema = np.full(n_instruments, np.nan)
+        self.signal_ema = np.full(n_instruments, np.nan)
+        self.macd_line = np.full(n_instruments, np.nan)
+        # 1 where the MACD line is above the signal line, -1 at or below, 0 before the first value
+        self.crossover = np.zeros(n_instruments, dtype=np.int8)
+        
+        # Initialize the rest of the state for each instrument, in one object per instrument
+        self.state: Dict[str, _MacdState] = {}
+        for row, (instrument_key, instrument) in enumerate(self.instruments.items()):
+            state = _MacdState(instrument, row)
+            self.state[instrument_key] = state
             
             # Get initial position if exists
             position = self.position_tracker.get_position(instrument_key)
             if position:
-                if position.quantity > 0:
-                    self.position_side[instrument_key] = 'LONG'
-                elif position.quantity < 0:
-                    self.position_side[instrument_key] = 'SHORT'
+                state.position_side = (position.quantity > 0) - (position.quantity < 0)
         
         # Log initialization
         strategy_name = self.__class__.__name__
-        logger.info(f"Initialized {strategy_name} with settings: fast={self.fast_period}, slow={self.slow_period}, signal={self.signal_period}")
+        logger.info("Initialized %s with settings: fast=%s, slow=%s, signal=%s", strategy_name, self.fast_period, self.slow_period, self.signal_period)
         
         # Try to save strategy settings
         settings = {
@@ -74,10 +141,9 @@ class MACDStrategy(TradingStrategy):
     
     def on_tick_data(self, data: Dict[str, Any]):
         """Process incoming tick data"""
-        instrument_key = data.get('instrument_key')
-        
         # Ensure this is an instrument we're watching
-        if not instrument_key or instrument_key not in self.instruments:
+        state = self.state.get(data.get('instrument_key'))
+        if state is None:
             return
         
         # Extract price data
@@ -85,105 +151,160 @@ class MACDStrategy(TradingStrategy):
         if not ltp:
             return
         
-        # Update price history
-        self.prices[instrument_key].append(ltp)
-        
-        # Keep only enough price history for calculations
-        # We need at least slow_period + signal_period data points
-        required_points = max(self.slow_period, self.fast_period) + self.signal_period
-        if len(self.prices[instrument_key]) > required_points * 3:  # Keep 3x required data for possible analysis
-            self.prices[instrument_key] = self.prices[instrument_key][-(required_points * 3):]
-        
-        # Calculate MACD if we have enough data
-        self._calculate_macd(instrument_key)
+        # Update MACD with the new price
+        self._calculate_macd(state, ltp)
         
         # Generate trading signals
-        self._generate_signals(instrument_key)
+        self._generate_signals(state)
     
-    def _calculate_macd(self, instrument_key: str):
-        """Calculate MACD for an instrument"""
-        prices = np.array(self.prices[instrument_key])
+    def on_tick_batch(self, ticks: List[Dict[str, Any]]):
+        """Process a batch of ticks, updating the MACD of every seeded instrument in one pass"""
+        ready = []
+        prices = []
+        for data in ticks:
+            state = self.state.get(data.get('instrument_key'))
+            if state is None:
+                continue
+            
+            ltp = data.get('ltp')
+            if not ltp:
+                continue
+            
+            # Instruments still seeding their EMAs are updated one at a time
+            if state.ready:
+                ready.append(state)
+                prices.append(ltp)
+            else:
+                self._apply_batched_tick(state, ltp)
         
-        # Need at least slow_period data points
-        if len(prices) < self.slow_period:
+        if len(ready) < self.BATCH_VECTORIZE_MIN:
+            for state, ltp in zip(ready, prices):
+                self._apply_batched_tick(state, ltp)
             return
         
-        try:
-            # Calculate fast EMA
-            fast_ema = self._calculate_ema(prices, self.fast_period)
-            
-            # Calculate slow EMA
-            slow_ema = self._calculate_ema(prices, self.slow_period)
-            
-            # Calculate MACD line
-            macd = fast_ema - slow_ema
-            
-            # Calculate signal line (EMA of MACD)
-            # Need at least signal_period MACD values
-            if len(macd) >= self.signal_period:
-                signal = self._calculate_ema(macd, self.signal_period)
-                
-                # Store the latest values
-                self.macd_line[instrument_key] = macd[-1]
-                self.signal_line[instrument_key] = signal[-1]
+        # Same recurrences as _calculate_macd, over the batch's rows at once
+        rows = np.fromiter((state.row for state in ready), dtype=np.intp, count=len(ready))
+        price = np.array(prices, dtype=np.float64)
+        
+        fast = self.fast_ema[rows]
+        fast += (price - fast) * self._fast_k
+        slow = self.slow_ema[rows]
+        slow += (price - slow) * self._slow_k
+        macd = fast - slow
+        signal = self.signal_ema[rows]
+        signal += (macd - signal) * self._signal_k
         
+        self.fast_ema[rows] = fast
+        self.slow_ema[rows] = slow
+        self.signal_ema[rows] = signal
+        self.macd_line[rows] = macd
+        
+        # Act only on the instruments whose side of the signal line flipped
+        current = np.where(macd > signal, 1, -1).astype(np.int8)
+        previous = self.crossover[rows]
+        self.crossover[rows] = current
+        for i in np.flatnonzero(previous * current < 0):
+            try:
+                self._place_crossover_orders(ready[i], int(current[i]))
+            except Exception as e:
+                logger.error("Error placing MACD crossover orders: %s", e)
+    
+    def _apply_batched_tick(self, state: _MacdState, price: float):
+        """Apply one tick of a batch, so an order that fails doesn't drop the rest of the batch"""
+        self._calculate_macd(state, price)
+        try:
+            self._generate_signals(state)
         except Exception as e:
-            logger.error(f"Error calculating MACD: {e}")
+            logger.error("Error placing MACD crossover orders: %s", e)
     
-    def _calculate_ema(self, data: np.ndarray, period: int) -> np.ndarray:
-        """Calculate Exponential Moving Average"""
-        if len(data) < period:
-            return np.array([])
+    def _calculate_macd(self, state: _MacdState, price: float):
+        """Update MACD for an instrument with a new price"""
+        row = state.row
+        fast_ema = self.fast_ema
+        slow_ema = self.slow_ema
+        signal_ema = self.signal_ema
         
-        # Initialize EMA with SMA for the first period points
-        ema = np.zeros_like(data)
-        ema[:period] = np.mean(data[:period])
+        if state.ready:
+            fast = fast_ema.item(row)
+            fast = fast_ema[row] = (price - fast) * self._fast_k + fast
+            slow = slow_ema.item(row)
+            slow = slow_ema[row] = (price - slow) * self._slow_k + slow
+            macd = self.macd_line[row] = fast - slow
+            signal = signal_ema.item(row)
+            signal_ema[row] = (macd - signal) * self._signal_k + signal
+            return
         
-        # Calculate multiplier
-        multiplier = 2 / (period + 1)
+        price_count = state.price_count = state.price_count + 1
         
-        # Calculate EMA for the rest of the points
-        for i in range(period, len(data)):
-            ema[i] = (data[i] - ema[i-1]) * multiplier + ema[i-1]
+        # Advance each EMA, or accumulate its SMA seed until it has period values
+        if price_count > self.fast_period:
+            fast = fast_ema.item(row)
+            fast_ema[row] = (price - fast) * self._fast_k + fast
+        else:
+            state.fast_seed += price
+            if price_count == self.fast_period:
+                fast_ema[row] = state.fast_seed / self.fast_period
         
-        return ema
+        if price_count > self.slow_period:
+            slow = slow_ema.item(row)
+            slow_ema[row] = (price - slow) * self._slow_k + slow
+        else:
+            state.slow_seed += price
+            if price_count == self.slow_period:
+                slow_ema[row] = state.slow_seed / self.slow_period
+        
+        # Need both EMAs, i.e. at least slow_period data points
+        if price_count < self.fast_period or price_count < self.slow_period:
+            return
+        
+        # Calculate MACD line, seeding the signal line (EMA of MACD) with its first
+        # signal_period values
+        macd = fast_ema.item(row) - slow_ema.item(row)
+        macd_count = state.macd_count = state.macd_count + 1
+        state.signal_seed += macd
+        if macd_count < self.signal_period:
+            return
+        
+        signal_ema[row] = state.signal_seed / self.signal_period
+        self.macd_line[row] = macd
+        state.ready = True
     
-    def _generate_signals(self, instrument_key: str):
+    def _generate_signals(self, state: _MacdState):
         """Generate trading signals based on MACD"""
         # Ensure we have both MACD and signal line values
-        if self.macd_line[instrument_key] is None or self.signal_line[instrument_key] is None:
+        if not state.ready:
             return
         
-        instrument = self.instruments[instrument_key]
-        current_side = self.position_side[instrument_key]
-        
-        # Get current position
-        position = self.position_tracker.get_position(instrument_key)
-        
         # Determine current crossover state
-        macd_value = self.macd_line[instrument_key]
-        signal_value = self.signal_line[instrument_key]
-        
-        if macd_value > signal_value:
-            current_crossover = 'ABOVE'
-        else:
-            current_crossover = 'BELOW'
+        row = state.row
+        current_crossover = 1 if self.macd_line.item(row) > self.signal_ema.item(row) else -1
         
         # Compare with previous crossover state to detect crossovers
-        previous_crossover = self.previous_crossover[instrument_key]
+        previous_crossover = self.crossover.item(row)
         
         # Update previous crossover state for next time
-        self.previous_crossover[instrument_key] = current_crossover
+        self.crossover[row] = current_crossover
         
-        # If this is the first calculation, just record the state
-        if previous_crossover is None:
+        # Nothing to do unless the sign flipped; on the first calculation the
+        # previous state is 0, so it is just recorded
+        if previous_crossover * current_crossover >= 0:
             return
         
+        self._place_crossover_orders(state, current_crossover)
+    
+    def _place_crossover_orders(self, state: _MacdState, direction: int):
+        """Trade a crossover of the MACD line above (direction 1) or below (-1) the signal line"""
+        instrument = state.instrument
+        current_side = state.position_side
+        
+        # Get current position
+        position = self.position_tracker.get_position(instrument.instrument_key)
+        
         # MACD line crosses above signal line -> BUY signal
-        if previous_crossover == 'BELOW' and current_crossover == 'ABOVE':
+        if direction > 0:
             # If we're short, close the position
-            if current_side == 'SHORT' and position and position.quantity < 0:
-                logger.info(f"MACD crossover BUY signal: Closing SHORT position for {instrument.symbol}")
+            if current_side < 0 and position and position.quantity < 0:
+                logger.info("MACD crossover BUY signal: Closing SHORT position for %s", instrument.symbol)
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="BUY",
@@ -191,21 +312,21 @@ class MACDStrategy(TradingStrategy):
                 )
             
             # Only open a new long position if not already long
-            if current_side != 'LONG':
-                logger.info(f"MACD crossover BUY signal: Opening LONG position for {instrument.symbol}")
+            if current_side != 1:
+                logger.info("MACD crossover BUY signal: Opening LONG position for %s", instrument.symbol)
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="BUY",
                     quantity=self.quantity
                 )
                 
-                self.position_side[instrument_key] = 'LONG'
+                state.position_side = 1
         
         # MACD line crosses below signal line -> SELL signal
-        elif previous_crossover == 'ABOVE' and current_crossover == 'BELOW':
+        else:
             # If we're long, close the position
-            if current_side == 'LONG' and position and position.quantity > 0:
-                logger.info(f"MACD crossover SELL signal: Closing LONG position for {instrument.symbol}")
+            if current_side > 0 and position and position.quantity > 0:
+                logger.info("MACD crossover SELL signal: Closing LONG position for %s", instrument.symbol)
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="SELL",
@@ -213,38 +334,57 @@ class MACDStrategy(TradingStrategy):
                 )
             
             # Only open a new short position if not already short
-            if current_side != 'SHORT':
-                logger.info(f"MACD crossover SELL signal: Opening SHORT position for {instrument.symbol}")
+            if current_side != -1:
+                logger.info("MACD crossover SELL signal: Opening SHORT position for %s", instrument.symbol)
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="SELL",
                     quantity=self.quantity
                 )
                 
-                self.position_side[instrument_key] = 'SHORT'
+                state.position_side = -1
+    
+    def generate_signals(self, price_data: pd.DataFrame) -> Optional[np.ndarray]:
+        """Compute target positions from MACD/signal line crossovers for vectorized backtests"""
+        closes = price_data['Close'].to_numpy(dtype=np.float64)
+        targets = np.zeros(len(closes))
+        
+        # MACD starts once the slow EMA is seeded, the signal line once it has signal_period values;
+        # the difference is taken in the fast EMA's buffer rather than a new array
+        macd = _calculate_ema(closes, self.fast_period)
+        macd -= _calculate_ema(closes, self.slow_period)
+        macd = macd[self.slow_period - 1:]
+        signal = _calculate_ema(macd, self.signal_period)
+        start = self.slow_period - 1 + self.signal_period - 1
+        if start >= len(closes):
+            return targets
+        
+        # Side follows the crossover state, but only from the first crossover on
+        above = macd[self.signal_period - 1:] > signal[self.signal_period - 1:]
+        crossovers = np.flatnonzero(above[1:] != above[:-1]) + 1
+        if len(crossovers) == 0:
+            return targets
+        
+        first = crossovers[0]
+        targets[start + first:] = np.where(above[first:], self.quantity, -self.quantity)
+        
+        return targets
     
     def on_position_update(self, position: Position):
         """Process position updates"""
-        instrument_key = position.instrument_key
+        state = self.state.get(position.instrument_key)
+        if state is None:
+            return
         
         # Update position side based on quantity
-        if position.quantity > 0:
-            self.position_side[instrument_key] = 'LONG'
-        elif position.quantity < 0:
-            self.position_side[instrument_key] = 'SHORT'
-        else:
-            self.position_side[instrument_key] = None
+        state.position_side = (position.quantity > 0) - (position.quantity < 0)
     
     def cleanup(self):
         """Clean up resources"""
-        logger.info(f"Cleaning up {self.__class__.__name__} strategy")
+        logger.info("Cleaning up %s strategy", self.__class__.__name__)
         
         # Clear data structures
-        self.prices.clear()
-        self.macd_line.clear()
-        self.signal_line.clear()
-        self.position_side.clear()
-        self.previous_crossover.clear()
+        self.state.clear()
     
     @classmethod
     def load_saved_settings(cls) -> Dict[str, Any]:
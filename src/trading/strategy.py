@@ -3,7 +3,10 @@ Strategy interface for implementing custom trading strategies
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
+
+import numpy as np
 
 from src.api.upstox_client import UpstoxClient
 from src.models.instrument import Instrument
@@ -11,11 +14,21 @@ from src.models.position import Position
 from src.models.order import Order
 from src.trading.order_manager import OrderManager
 from src.trading.position_tracker import PositionTracker
+from src.trading.tick_dispatcher import TickDispatcher
+from src.utils.logger import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class TradingStrategy(ABC):
     """Base class for implementing trading strategies"""
     
+    # Attributes are stored in fixed slots; subclasses list their own in __slots__,
+    # or get an instance __dict__ for them if they don't
+    __slots__ = ('client', 'order_manager', 'position_tracker', 'instruments', 'is_running',
+                 'strategy_params', '_registered_callbacks', '_tick_dispatcher')
+    
     def __init__(self, client: UpstoxClient, order_manager: OrderManager, position_tracker: PositionTracker):
         """Initialize with API client and trading components"""
         self.client = client
@@ -25,6 +38,7 @@ class TradingStrategy(ABC):
         self.is_running = False
         self.strategy_params: Dict[str, Any] = {}
         self._registered_callbacks = []  # Track registered callbacks for cleanup
+        self._tick_dispatcher: Optional[TickDispatcher] = None
     
     def set_instruments(self, instruments: List[Instrument]):
         """Set the instruments to trade"""
@@ -69,10 +83,8 @@ class TradingStrategy(ABC):
                 if position.instrument_key in self.instruments:
                     self.on_position_update(position)
                     
-            from src.utils.logger import logger
             logger.info(f"Strategy started: {self.__class__.__name__}")
         except Exception as e:
-            from src.utils.logger import logger
             logger.error(f"Error starting strategy: {e}")
             self.stop()  # Cleanup resources if initialization fails
     
@@ -89,32 +101,29 @@ class TradingStrategy(ABC):
             self.cleanup()
             
             self.is_running = False
-            from src.utils.logger import logger
             logger.info(f"Strategy stopped: {self.__class__.__name__}")
         except Exception as e:
-            from src.utils.logger import logger
             logger.error(f"Error stopping strategy: {e}")
     
     def _unregister_callbacks(self):
         """Unregister all callbacks"""
-        from src.utils.logger import logger
-        
         # Unregister position callbacks
         for callback_info in self._registered_callbacks:
             if callback_info['type'] == 'position':
-                try:
-                    self.position_tracker.position_callbacks[callback_info['instrument_key']].remove(
-                        self.on_position_update
-                    )
-                except (KeyError, ValueError):
-                    pass
+                self.position_tracker.unregister_position_callback(
+                    callback_info['instrument_key'], self.on_position_update
+                )
                     
         # Unregister market data callbacks
-        try:
-            self.client.unregister_callback('full', self.on_tick_data)
-            self.client.unregister_callback('ltpc', self.on_tick_data)
-        except Exception as e:
-            logger.error(f"Error unregistering market data callbacks: {e}")
+        if self._tick_dispatcher is not None:
+            try:
+                self.client.unregister_callback('full', self._tick_dispatcher.enqueue)
+                self.client.unregister_callback('ltpc', self._tick_dispatcher.enqueue)
+            except Exception as e:
+                logger.error(f"Error unregistering market data callbacks: {e}")
+            
+            self._tick_dispatcher.stop()
+            self._tick_dispatcher = None
             
         # Clear callback tracking
         self._registered_callbacks = []
@@ -126,9 +135,12 @@ class TradingStrategy(ABC):
             try:
                 self.client.subscribe_feeds(instrument_keys)
                 
-                # Register callbacks for tick data
-                self.client.register_callback('full', self.on_tick_data)
-                self.client.register_callback('ltpc', self.on_tick_data)
+                # Register callbacks for tick data, handing ticks to a worker thread so
+                # strategy compute and order placement stay off the WebSocket thread
+                self._tick_dispatcher = TickDispatcher(self.on_tick_batch)
+                self._tick_dispatcher.start()
+                self.client.register_callback('full', self._tick_dispatcher.enqueue)
+                self.client.register_callback('ltpc', self._tick_dispatcher.enqueue)
                 
                 # Track callback registration
                 self._registered_callbacks.append({
@@ -140,7 +152,6 @@ class TradingStrategy(ABC):
                     'feed_type': 'ltpc'
                 })
             except Exception as e:
-                from src.utils.logger import logger
                 logger.error(f"Failed to setup market data subscriptions: {e}")
     
     @abstractmethod
@@ -153,6 +164,19 @@ class TradingStrategy(ABC):
         """Process tick data - to be implemented by subclasses"""
         pass
     
+    def on_tick_batch(self, ticks: List[Dict[str, Any]]):
+        """
+        Process a batch of ticks, at most one per instrument - can be overridden by subclasses
+        
+        Live ticks are delivered in batches of those coalesced since the previous
+        batch; by default each is passed to on_tick_data.
+        """
+        for data in ticks:
+            try:
+                self.on_tick_data(data)
+            except Exception as e:
+                logger.error(f"Error processing tick data: {e}")
+    
     @abstractmethod
     def on_position_update(self, position: Position):
         """Process position updates - to be implemented by subclasses"""
@@ -162,14 +186,44 @@ class TradingStrategy(ABC):
         """Process order updates - can be overridden by subclasses"""
         pass
     
+    def generate_signals(self, price_data: 'pd.DataFrame') -> Optional['np.ndarray']:
+        """
+        Compute the target position for every bar of price_data - can be overridden by subclasses
+        
+        Used by BacktestEngine.run_vectorized. Return an array with one signed
+        quantity per bar, or None if the strategy only supports event-driven runs.
+        """
+        return None
+    
     def cleanup(self):
         """Clean up resources - can be overridden by subclasses"""
         pass
 
 
+@dataclass(slots=True)
+class _SmaState:
+    """Moving average state of one instrument, updated incrementally per tick"""
+    
+    instrument: Instrument
+    # Ring buffer of the last max_period prices, written at price_count % max_period
+    prices: np.ndarray
+    price_count: int = 0
+    short_sum: float = 0.0
+    long_sum: float = 0.0
+    short_ma: Optional[float] = None
+    long_ma: Optional[float] = None
+    position_side: int = 0  # 1 long, -1 short, 0 flat
+
+
 class SimpleMovingAverageStrategy(TradingStrategy):
     """Example strategy using Simple Moving Averages"""
     
+    __slots__ = ('short_period', 'long_period', 'quantity', 'max_period', 'state')
+    
+    # Ticks between recomputing the running sums from the price buffer, which
+    # discards floating point error accumulated by the incremental updates
+    SUM_RESYNC_TICKS = 10000
+    
     def initialize(self):
         """Initialize the strategy"""
         # Get strategy parameters with defaults
@@ -177,33 +231,23 @@ class SimpleMovingAverageStrategy(TradingStrategy):
         self.long_period = self.get_parameter('long_period', 30)
         self.quantity = self.get_parameter('quantity', 1)
         
-        # Initialize data storage for each instrument
-        self.prices: Dict[str, List[float]] = {}
-        self.short_ma: Dict[str, Optional[float]] = {}
-        self.long_ma: Dict[str, Optional[float]] = {}
-        self.position_side: Dict[str, str] = {}  # 'LONG', 'SHORT', or None
-        
-        # Initialize price lists
-        for instrument_key in self.instruments:
-            self.prices[instrument_key] = []
-            self.short_ma[instrument_key] = None
-            self.long_ma[instrument_key] = None
-            self.position_side[instrument_key] = None
+        # Initialize state for each instrument, all in one object per instrument
+        self.max_period = max(self.short_period, self.long_period)
+        self.state: Dict[str, _SmaState] = {}
+        for instrument_key, instrument in self.instruments.items():
+            state = _SmaState(instrument, np.empty(self.max_period, dtype=np.float64))
+            self.state[instrument_key] = state
             
             # Get initial position if exists
             position = self.position_tracker.get_position(instrument_key)
             if position:
-                if position.quantity > 0:
-                    self.position_side[instrument_key] = 'LONG'
-                elif position.quantity < 0:
-                    self.position_side[instrument_key] = 'SHORT'
+                state.position_side = (position.quantity > 0) - (position.quantity < 0)
     
     def on_tick_data(self, data: Dict[str, Any]):
         """Process incoming tick data"""
-        instrument_key = data.get('instrument_key')
-        
         # Ensure this is an instrument we're watching
-        if not instrument_key or instrument_key not in self.instruments:
+        state = self.state.get(data.get('instrument_key'))
+        if state is None:
             return
         
         # Extract price data
@@ -211,94 +255,131 @@ class SimpleMovingAverageStrategy(TradingStrategy):
         if not ltp:
             return
         
-        # Update price history
-        self.prices[instrument_key].append(ltp)
+        # Update price history, overwriting the oldest price once the buffer is full
+        count = state.price_count
+        prices = state.prices
+        max_period = self.max_period
         
-        # Keep only enough price history for calculations
-        max_period = max(self.short_period, self.long_period)
-        if len(self.prices[instrument_key]) > max_period:
-            self.prices[instrument_key] = self.prices[instrument_key][-max_period:]
+        # Update the running sums before the write, which may overwrite the price
+        # leaving the long window
+        short_sum = state.short_sum + ltp
+        if count >= self.short_period:
+            short_sum -= prices.item((count - self.short_period) % max_period)
+        long_sum = state.long_sum + ltp
+        if count >= self.long_period:
+            long_sum -= prices.item((count - self.long_period) % max_period)
+        
+        prices[count % max_period] = ltp
+        count = state.price_count = count + 1
+        
+        if count % self.SUM_RESYNC_TICKS == 0:
+            short_sum = float(self._latest_prices(state, min(count, self.short_period)).sum())
+            long_sum = float(self._latest_prices(state, min(count, self.long_period)).sum())
+        
+        state.short_sum = short_sum
+        state.long_sum = long_sum
         
         # Calculate moving averages
-        self._calculate_moving_averages(instrument_key)
+        self._calculate_moving_averages(state)
         
         # Generate trading signals
-        self._generate_signals(instrument_key)
+        self._generate_signals(state)
     
-    def _calculate_moving_averages(self, instrument_key: str):
+    def _latest_prices(self, state: _SmaState, n: int) -> np.ndarray:
+        """Get the last n prices of an instrument, oldest first"""
+        buffer = state.prices
+        end = state.price_count % self.max_period
+        start = (end - n) % self.max_period
+        
+        # A view when the prices are contiguous in the buffer, a copy when they wrap
+        if start < end:
+            return buffer[start:end]
+        return np.concatenate((buffer[start:], buffer[:end]))
+    
+    def _calculate_moving_averages(self, state: _SmaState):
         """Calculate moving averages for an instrument"""
-        prices = self.prices[instrument_key]
+        count = state.price_count
         
         # Calculate short MA if enough data
-        if len(prices) >= self.short_period:
-            self.short_ma[instrument_key] = sum(prices[-self.short_period:]) / self.short_period
+        if count >= self.short_period:
+            state.short_ma = state.short_sum / self.short_period
         
         # Calculate long MA if enough data
-        if len(prices) >= self.long_period:
-            self.long_ma[instrument_key] = sum(prices[-self.long_period:]) / self.long_period
+        if count >= self.long_period:
+            state.long_ma = state.long_sum / self.long_period
     
-    def _generate_signals(self, instrument_key: str):
+    def _generate_signals(self, state: _SmaState):
         """Generate trading signals based on moving averages"""
         # Ensure we have both MAs calculated
-        if self.short_ma[instrument_key] is None or self.long_ma[instrument_key] is None:
+        short_ma = state.short_ma
+        long_ma = state.long_ma
+        if short_ma is None or long_ma is None:
             return
         
-        instrument = self.instruments[instrument_key]
-        current_side = self.position_side[instrument_key]
+        # Long (1) when the short MA is above the long MA, short (-1) when below,
+        # as the sign of their difference
+        target_side = (short_ma > long_ma) - (short_ma < long_ma)
+        
+        # Nothing to trade while already on that side, the common case on a tick,
+        # or while the averages are equal
+        current_side = state.position_side
+        if target_side == current_side or target_side == 0:
+            return
+        
+        instrument = state.instrument
         
         # Get current position
-        position = self.position_tracker.get_position(instrument_key)
+        position = self.position_tracker.get_position(instrument.instrument_key)
         
-        # Check for buy signal (short MA crosses above long MA)
-        if self.short_ma[instrument_key] > self.long_ma[instrument_key]:
-            # If we're not already long, go long
-            if current_side != 'LONG':
-                # Close any existing short position
-                if current_side == 'SHORT' and position and position.quantity < 0:
-                    self.order_manager.place_market_order(
-                        instrument=instrument,
-                        transaction_type="BUY",
-                        quantity=abs(position.quantity)
-                    )
-                
-                # Open a new long position
+        if target_side > 0:
+            # Close any existing short position
+            if current_side < 0 and position and position.quantity < 0:
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="BUY",
-                    quantity=self.quantity
+                    quantity=abs(position.quantity)
                 )
-                
-                self.position_side[instrument_key] = 'LONG'
-        
-        # Check for sell signal (short MA crosses below long MA)
-        elif self.short_ma[instrument_key] < self.long_ma[instrument_key]:
-            # If we're not already short, go short
-            if current_side != 'SHORT':
-                # Close any existing long position
-                if current_side == 'LONG' and position and position.quantity > 0:
-                    self.order_manager.place_market_order(
-                        instrument=instrument,
-                        transaction_type="SELL",
-                        quantity=position.quantity
-                    )
-                
-                # Open a new short position
+            
+            # Open a new long position
+            self.order_manager.place_market_order(
+                instrument=instrument,
+                transaction_type="BUY",
+                quantity=self.quantity
+            )
+        else:
+            # Close any existing long position
+            if current_side > 0 and position and position.quantity > 0:
                 self.order_manager.place_market_order(
                     instrument=instrument,
                     transaction_type="SELL",
-                    quantity=self.quantity
+                    quantity=position.quantity
                 )
-                
-                self.position_side[instrument_key] = 'SHORT'
+            
+            # Open a new short position
+            self.order_manager.place_market_order(
+                instrument=instrument,
+                transaction_type="SELL",
+                quantity=self.quantity
+            )
+        
+        state.position_side = target_side
+    
+    def generate_signals(self, price_data: 'pd.DataFrame') -> Optional['np.ndarray']:
+        """Compute target positions from the moving average crossover for vectorized backtests"""
+        closes = price_data['Close']
+        spread = closes.rolling(self.short_period).mean() - closes.rolling(self.long_period).mean()
+        
+        # Long above, short below; hold the previous side while the averages are equal
+        side = spread.gt(0).astype(float) - spread.lt(0).astype(float)
+        side = side.where(side != 0).ffill().fillna(0)
+        
+        return (side * self.quantity).to_numpy()
     
     def on_position_update(self, position: Position):
         """Process position updates"""
-        instrument_key = position.instrument_key
+        state = self.state.get(position.instrument_key)
+        if state is None:
+            return
         
         # Update position side based on quantity
-        if position.quantity > 0:
-            self.position_side[instrument_key] = 'LONG'
-        elif position.quantity < 0:
-            self.position_side[instrument_key] = 'SHORT'
-        else:
-            self.position_side[instrument_key] = None
\ No newline at end of file
+        state.position_side = (position.quantity > 0) - (position.quantity < 0)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Coalescing hand-off of market data ticks from the WebSocket thread to a worker
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import logger
+
+class TickDispatcher:
+    """Delivers the newest ticks per instrument to a handler on its own thread, in batches"""
+    
+    def __init__(self, handler: Callable[[List[Dict[str, Any]]], None]):
+        """Initialize with the handler to call for each batch, e.g. TradingStrategy.on_tick_batch"""
+        self.handler = handler
+        # Newest undelivered tick per instrument key; a newer tick replaces a stale one
+        self._latest: Dict[Any, Dict[str, Any]] = {}
+        # (timestamp, ltp) of the last tick queued per instrument key, to drop the copy
+        # of a tick that arrives on both the 'full' and 'ltpc' feeds
+        self._last_seen: Dict[Any, Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def enqueue(self, data: Dict[str, Any]):
+        """Queue a tick for the worker; registered as the feed callback, so it only stores and signals"""
+        instrument_key = data.get('instrument_key')
+        timestamp = data.get('timestamp')
+        if timestamp is not None:
+            seen = (timestamp, data.get('ltp'))
+            if self._last_seen.get(instrument_key) == seen:
+                return
+            self._last_seen[instrument_key] = seen
+        
+        with self._lock:
+            self._latest[instrument_key] = data
+        self._pending.set()
+    
+    def start(self):
+        """Start delivering ticks in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._thread.start()
+    
+    def _dispatch_loop(self):
+        """Deliver queued ticks in batches until stopped"""
+        while not self._stop_event.is_set():
+            self._pending.wait()
+            
+            # Swap the pending ticks out so the WebSocket thread can keep queueing
+            with self._lock:
+                batch = self._latest
+                self._latest = {}
+                self._pending.clear()
+            
+            if self._stop_event.is_set():
+                break
+            
+            try:
+                self.handler(list(batch.values()))
+            except Exception as e:
+                logger.error(f"Error in tick handler: {e}")
+    
+    def stop(self):
+        """Stop delivering ticks, dropping any still queued"""
+        self._stop_event.set()
+        self._pending.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        
+        with self._lock:
+            self._latest = {}
+        self._last_seen = {}
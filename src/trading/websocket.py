@@ -3,14 +3,49 @@ Upstox WebSocket client implementation
 """
 
 import json
+import logging
 import threading
 import time
-from typing import Dict, List, Set, Callable, Optional, Any
+from typing import Dict, List, Set, Callable, Optional, Any, Tuple
 import websocket
 
 from src.auth.authenticator import UpstoxAuthenticator
 from src.utils.logger import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Message codecs; orjson parses and serializes in C when installed. Its dumps returns
+# UTF-8 bytes, which websocket-client sends unchanged in a text frame
+_loads = orjson.loads if orjson is not None else json.loads
+_dumps = orjson.dumps if orjson is not None else json.dumps
+
+# Keys that may carry a message's type, in order of precedence after 'type'
+_ALT_TYPE_KEYS = ('message-type', 'message_type')
+
+# Builders of the subscription message formats the feed may accept, in the order tried
+_SUBSCRIPTION_FORMATS = (
+    # Format 1: Standard format with instrument_keys
+    lambda instrument_keys, feed_type: {
+        "type": "subscribe",
+        "instrument_keys": instrument_keys,
+        "feed_type": feed_type
+    },
+    # Format 2: Alternative format with instrumentKeys
+    lambda instrument_keys, feed_type: {
+        "type": "subscribe",
+        "instrumentKeys": instrument_keys,
+        "feedType": feed_type
+    },
+    # Format 3: Simple format
+    lambda instrument_keys, feed_type: {
+        "subscribe": instrument_keys,
+        "mode": feed_type
+    },
+)
+
 
 class UpstoxWebSocket:
     """Client for Upstox WebSocket market data feed"""
@@ -23,9 +58,21 @@ class UpstoxWebSocket:
         self.authenticator = authenticator
         self.ws = None
         self.ws_thread = None
-        self.callbacks = {}
+        # Callback tuples are replaced on register/unregister rather than mutated,
+        # so message dispatch iterates them without copying or locking
+        self.callbacks: Dict[str, Tuple[Callable[[Dict], None], ...]] = {}
         self.connected = False
+        # Set while the feed is connected and authenticated, for waiting on the connection
+        self.connected_event = threading.Event()
         self.subscribed_instruments = set()
+        # Alternative type key the feed last used, tried right after 'type'
+        self._type_key = 'message-type'
+        # Index of the subscription format last sent successfully
+        self._subscription_format = 0
+        # Handshake headers and encoded authentication messages, built once per access token
+        self._auth_token: Optional[str] = None
+        self._auth_headers: List[str] = []
+        self._auth_messages: Tuple[Any, Any] = (b'', b'')
     
     def connect(self) -> bool:
         """Connect to the WebSocket feed"""
@@ -41,10 +88,7 @@ class UpstoxWebSocket:
             self.ws_thread.start()
             
             # Wait for connection to establish
-            timeout = 5.0
-            start_time = time.time()
-            while not self.connected and time.time() - start_time < timeout:
-                time.sleep(0.2)
+            self.connected_event.wait(timeout=5.0)
             
             return self.connected
         
@@ -53,25 +97,17 @@ class UpstoxWebSocket:
     def _on_message(self, ws, message):
         """Handle incoming WebSocket messages"""
         try:
-            data = json.loads(message)
+            data = _loads(message)
             
-            # Log first few messages for debugging
-            if isinstance(data, dict):
-                logger.debug(f"WebSocket message received: {list(data.keys())[:5]}")
-            else:
-                logger.debug(f"WebSocket message received: {type(data)}")
+            # Log messages for debugging, only building the summary when it will be emitted
+            if logger.isEnabledFor(logging.DEBUG):
+                if isinstance(data, dict):
+                    logger.debug("WebSocket message received: %s", list(data.keys())[:5])
+                else:
+                    logger.debug("WebSocket message received: %s", type(data))
             
             # Determine message type
-            msg_type = None
-            if isinstance(data, dict):
-                if 'type' in data:
-                    msg_type = data['type']
-                elif 'message-type' in data:
-                    msg_type = data['message-type']
-                elif 'message_type' in data:
-                    msg_type = data['message_type']
-                elif 'status' in data:
-                    msg_type = 'status'
+            msg_type = self._message_type(data) if isinstance(data, dict) else None
             
             # Handle authentication status
             if msg_type == 'status' or msg_type == 'authenticate':
@@ -79,30 +115,51 @@ class UpstoxWebSocket:
                 if status == 'success':
                     logger.info("WebSocket authentication successful")
                     self.connected = True
+                    self.connected_event.set()
                 else:
                     error_msg = data.get('message', 'Unknown error')
                     logger.error(f"WebSocket authentication failed: {error_msg}")
                     self.connected = False
+                    self.connected_event.clear()
             
             # Call callbacks for this message type
-            if msg_type and msg_type in self.callbacks:
-                for callback in self.callbacks[msg_type]:
+            callbacks = self.callbacks
+            if msg_type:
+                for callback in callbacks.get(msg_type, ()):
                     try:
                         callback(data)
                     except Exception as e:
                         logger.error(f"Error in WebSocket callback: {e}")
             
             # Also call general data callbacks for market data
-            if 'data' in self.callbacks:
-                for callback in self.callbacks['data']:
-                    try:
-                        callback(data)
-                    except Exception as e:
-                        logger.error(f"Error in WebSocket data callback: {e}")
+            for callback in callbacks.get('data', ()):
+                try:
+                    callback(data)
+                except Exception as e:
+                    logger.error(f"Error in WebSocket data callback: {e}")
                         
         except Exception as e:
             logger.error(f"Error processing WebSocket message: {e}")
     
+    def _message_type(self, data: Dict) -> Optional[str]:
+        """Get the type of a message, trying the alternative key the feed last used after 'type'"""
+        if 'type' in data:
+            return data['type']
+        
+        # The cached key only gives the same result if no key of higher precedence is present
+        key = self._type_key
+        if key in data and (key == _ALT_TYPE_KEYS[0] or _ALT_TYPE_KEYS[0] not in data):
+            return data[key]
+        
+        for key in _ALT_TYPE_KEYS:
+            if key in data:
+                self._type_key = key
+                return data[key]
+        
+        if 'status' in data:
+            return 'status'
+        return None
+    
     def _on_error(self, ws, error):
         """Handle WebSocket errors"""
         logger.error(f"WebSocket error: {error}")
@@ -111,6 +168,7 @@ class UpstoxWebSocket:
         """Handle WebSocket connection close"""
         logger.info(f"WebSocket connection closed: {close_status_code} - {close_msg}")
         self.connected = False
+        self.connected_event.clear()
     
     def _on_open(self, ws):
         """Handle WebSocket connection open"""
@@ -123,28 +181,52 @@ class UpstoxWebSocket:
         
         # Try different authentication message formats (based on Upstox API)
         try:
+            self._build_auth()
+            auth_msg, auth_msg2 = self._auth_messages
+            
             # Format 1 - Authorization-style message with API key and token
-            auth_msg = {
-                "type": "authenticate",
-                "api_key": self.authenticator.api_key,
-                "access_token": self.authenticator.access_token
-            }
             logger.debug("Sending WebSocket authentication message (Format 1)")
-            ws.send(json.dumps(auth_msg))
+            ws.send(auth_msg)
             
-            # Wait a short time and if not authenticated, try alternate format
-            time.sleep(1)
-            if not self.connected:
-                # Format 2 - Simplified authentication with just the token
-                auth_msg2 = {
-                    "type": "auth",
-                    "token": self.authenticator.access_token
-                }
-                logger.debug("Sending WebSocket authentication message (Format 2)")
-                ws.send(json.dumps(auth_msg2))
+            # If not authenticated after a short time, try the alternate format. This
+            # runs on the thread that receives the reply, so it is scheduled rather than
+            # slept on, letting a success reply be handled as soon as it arrives
+            timer = threading.Timer(1.0, self._send_fallback_auth, args=(ws, auth_msg2))
+            timer.daemon = True
+            timer.start()
         except Exception as e:
             logger.error(f"Error during WebSocket authentication: {e}")
     
+    def _send_fallback_auth(self, ws, auth_msg):
+        """Send the alternate authentication message unless the first one succeeded"""
+        if self.connected or ws is not self.ws:
+            return
+        
+        try:
+            # Format 2 - Simplified authentication with just the token
+            logger.debug("Sending WebSocket authentication message (Format 2)")
+            ws.send(auth_msg)
+        except Exception as e:
+            logger.error(f"Error during WebSocket authentication: {e}")
+    
+    def _build_auth(self):
+        """Build the handshake headers and authentication messages, unless already built for the current token"""
+        access_token = self.authenticator.access_token
+        if access_token == self._auth_token and self._auth_headers:
+            return
+        
+        api_key = self.authenticator.api_key
+        self._auth_headers = [
+            f"Authorization: Bearer {access_token}",
+            f"Api-Key: {api_key}",
+            "Content-Type: application/json"
+        ]
+        self._auth_messages = (
+            _dumps({"type": "authenticate", "api_key": api_key, "access_token": access_token}),
+            _dumps({"type": "auth", "token": access_token})
+        )
+        self._auth_token = access_token
+    
     def _run_websocket(self):
         """Run WebSocket connection with retries"""
         max_retries = 3
@@ -162,11 +244,7 @@ class UpstoxWebSocket:
                         continue
                 
                 # Prepare headers with authentication
-                headers = {
-                    "Authorization": f"Bearer {self.authenticator.access_token}",
-                    "Api-Key": self.authenticator.api_key,
-                    "Content-Type": "application/json"
-                }
+                self._build_auth()
                 
                 # Create WebSocket connection
                 logger.debug(f"Connecting to WebSocket at {self.WS_URL}")
@@ -176,11 +254,13 @@ class UpstoxWebSocket:
                     on_message=self._on_message,
                     on_error=self._on_error,
                     on_close=self._on_close,
-                    header=[f"{k}: {v}" for k, v in headers.items()]
+                    header=self._auth_headers
                 )
                 
-                # Run WebSocket in blocking mode
-                self.ws.run_forever(ping_interval=30, ping_timeout=10)
+                # Run WebSocket in blocking mode. websocket-client validates UTF-8 in pure
+                # Python per frame; skipping it delivers messages as bytes, which _loads
+                # decodes (and validates) itself
+                self.ws.run_forever(ping_interval=30, ping_timeout=10, skip_utf8_validation=True)
                 
                 # If connection closed normally, break the loop
                 if self.connected:
@@ -209,32 +289,18 @@ class UpstoxWebSocket:
                 logger.error("Failed to connect WebSocket, cannot subscribe")
                 return False
         
-        # Try different subscription message formats
-        subscription_formats = [
-            # Format 1: Standard format with instrument_keys
-            {
-                "type": "subscribe",
-                "instrument_keys": instrument_keys,
-                "feed_type": feed_type
-            },
-            # Format 2: Alternative format with instrumentKeys
-            {
-                "type": "subscribe",
-                "instrumentKeys": instrument_keys,
-                "feedType": feed_type
-            },
-            # Format 3: Simple format
-            {
-                "subscribe": instrument_keys,
-                "mode": feed_type
-            }
-        ]
+        # Try the format that was last sent successfully first, then the others in order;
+        # only the message for each format actually tried is built
+        preferred = self._subscription_format
+        order = [preferred] + [i for i in range(len(_SUBSCRIPTION_FORMATS)) if i != preferred]
         
-        # Try each format
-        for i, format_data in enumerate(subscription_formats):
+        for i in order:
             try:
-                logger.debug(f"Sending subscription (Format {i+1}): {format_data}")
-                self.ws.send(json.dumps(format_data))
+                format_data = _SUBSCRIPTION_FORMATS[i](instrument_keys, feed_type)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Sending subscription (Format %d): %s", i + 1, format_data)
+                self.ws.send(_dumps(format_data))
+                self._subscription_format = i
                 # Add to subscribed instruments set
                 self.subscribed_instruments.update(instrument_keys)
                 return True
@@ -246,12 +312,12 @@ class UpstoxWebSocket:
     
     def register_callback(self, message_type: str, callback: Callable[[Dict], None]):
         """Register a callback for a specific message type"""
-        if message_type not in self.callbacks:
-            self.callbacks[message_type] = []
-        
-        self.callbacks[message_type].append(callback)
+        self.callbacks[message_type] = self.callbacks.get(message_type, ()) + (callback,)
     
     def unregister_callback(self, message_type: str, callback: Callable[[Dict], None]):
         """Unregister a callback"""
-        if message_type in self.callbacks and callback in self.callbacks[message_type]:
-            self.callbacks[message_type].remove(callback)
+        callbacks = self.callbacks.get(message_type, ())
+        if callback in callbacks:
+            # Drop the first match, as list.remove did
+            index = callbacks.index(callback)
+            self.callbacks[message_type] = callbacks[:index] + callbacks[index + 1:]
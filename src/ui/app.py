@@ -29,6 +29,9 @@ class TradingApp(App):
         ("ctrl+t", "toggle_dark", "Toggle Dark Mode"),
     ]
     
+    # Seconds within which repeated refresh requests are coalesced into one
+    REFRESH_DEBOUNCE = 0.5
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
@@ -41,6 +44,7 @@ class TradingApp(App):
         self.order_manager = None
         self.position_tracker = None
         self.initialized = False
+        self._last_refresh = float('-inf')
         
         # Initialize authenticator separately to handle any errors cleanly
         try:
@@ -188,10 +192,14 @@ class TradingApp(App):
     def action_refresh(self) -> None:
         """Refresh data"""
         if self.initialized:
-            # Refresh positions
-            self.position_tracker.fetch_positions()
+            # Ignore repeated presses while a refresh was just requested
+            now = time.monotonic()
+            if now - self._last_refresh < self.REFRESH_DEBOUNCE:
+                return
+            self._last_refresh = now
             
-            # Refresh PnL display
+            # Refresh positions and the PnL display; the display's worker does the
+            # fetch off the event loop, so it is not also fetched here
             self.query_one(PnLDisplay).refresh_positions()
     
     def action_toggle_dark(self) -> None:
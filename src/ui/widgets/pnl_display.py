@@ -2,6 +2,8 @@
 P&L display widget
 """
 
+import asyncio
+
 from textual.app import ComposeResult
 from textual.containers import Container, Vertical
 from textual.widgets import DataTable, Static
@@ -81,9 +83,9 @@ class PnLDisplay(Container):
             pnl_value.remove_class("positive")
             pnl_value.remove_class("negative")
     
-    @work
+    @work(exclusive=True)
     async def refresh_positions(self) -> None:
-        """Refresh positions data"""
+        """Refresh positions data, superseding any refresh still in progress"""
         if not self.position_tracker:
             self.query_one("#status_message").update("Position tracker not initialized")
             return
@@ -91,7 +93,8 @@ class PnLDisplay(Container):
         self.is_loading = True
         
         try:
-            positions = self.position_tracker.fetch_positions()
+            # The REST request blocks, so it runs in a thread to keep the UI responsive
+            positions = await asyncio.to_thread(self.position_tracker.fetch_positions)
             self._update_positions_table(positions)
         except Exception as e:
             self.query_one("#status_message").update(f"Error: {str(e)}")
@@ -358,4 +358,8 @@ class TradingPanel(Container):
     
     def _on_order_update(self, order) -> None:
         """Handle order updates"""
-        self.query_one("#order_status").update(f"Order update: {order.status} - {order}")
\ No newline at end of file
+        self.query_one("#order_status").update(f"Order update: {order.status} - {order}")
+        
+        # A fill changes the position, so poll positions now instead of at the next interval
+        if order.filled_quantity and self.position_tracker:
+            self.position_tracker.request_refresh()
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""
+Validation of registered callbacks
+"""
+
+import inspect
+from typing import Any
+
+from src.utils.logger import logger
+
+def validate_callback(callback: Any) -> bool:
+    """
+    Check that a callback can be called with a single positional argument
+    
+    Done once at registration, so dispatch loops can call callbacks without
+    checking them on every update.
+    
+    Args:
+        callback: Callback to check
+    
+    Returns:
+        True if the callback is valid
+    """
+    if not callable(callback):
+        logger.error(f"Cannot register callback: {callback!r} is not callable")
+        return False
+    
+    try:
+        signature = inspect.signature(callback)
+    except (TypeError, ValueError):
+        # Some builtins have no introspectable signature; accept them
+        return True
+    
+    try:
+        signature.bind(None)
+    except TypeError as e:
+        logger.error(f"Cannot register callback {callback!r}: {e}")
+        return False
+    
+    return True
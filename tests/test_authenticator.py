@@ -0,0 +1,154 @@
+"""
+Tests for the Upstox authenticator
+"""
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import src.auth.authenticator as authenticator
+from src.auth.authenticator import UpstoxAuthenticator, wait_for_callback
+
+class FakeResponse:
+    """Token endpoint response"""
+    
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+    
+    def json(self):
+        return self._payload
+
+class FakeTokenEndpoint:
+    """Token endpoint that rotates the refresh token and rejects spent ones"""
+    
+    def __init__(self, refresh_token):
+        self.valid_refresh_token = refresh_token
+        self.requests = []
+    
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.requests.append(data)
+        if data['refresh_token'] != self.valid_refresh_token:
+            return FakeResponse(401, {"message": "invalid refresh token"})
+        
+        self.valid_refresh_token = f"refresh-{len(self.requests)}"
+        return FakeResponse(200, {"access_token": f"access-{len(self.requests)}",
+                                  "refresh_token": self.valid_refresh_token, "expires_in": 7200})
+
+@pytest.fixture
+def token_home(tmp_path, monkeypatch):
+    """Point the token file at a temporary home holding tokens due for refresh"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(authenticator, "_TOKEN_CACHE", None)
+    token_file = tmp_path / ".upstox_tokens.json"
+    token_file.write_text(json.dumps({"access_token": "access-0", "refresh_token": "refresh-0",
+                                      "expiry": time.time() + 3600}))
+    
+    endpoint = FakeTokenEndpoint("refresh-0")
+    monkeypatch.setattr(authenticator, "_OAUTH_SESSION", endpoint)
+    return token_file, endpoint
+
+def _make_authenticator():
+    auth = UpstoxAuthenticator("key", "secret", "http://localhost:8000/callback")
+    auth._refresh_timer.cancel()
+    return auth
+
+def test_instances_share_one_refresh(token_home):
+    """Test that a second instance adopts the first one's refresh instead of spending the token again"""
+    token_file, endpoint = token_home
+    first = _make_authenticator()
+    second = _make_authenticator()
+    
+    first._proactive_refresh()
+    second._proactive_refresh()
+    
+    assert len(endpoint.requests) == 1
+    assert second.access_token == first.access_token == "access-1"
+    assert second.refresh_token == "refresh-1"
+    assert json.loads(token_file.read_text())["refresh_token"] == "refresh-1"
+    
+    first._refresh_timer.cancel()
+    second._refresh_timer.cancel()
+
+def test_rejected_refresh_keeps_newer_saved_token(token_home):
+    """Test that a 401 for a token spent by another instance does not clear the saved one"""
+    token_file, endpoint = token_home
+    first = _make_authenticator()
+    second = _make_authenticator()
+    
+    first._proactive_refresh()
+    
+    # The second instance races past the check and spends the old token
+    assert second._do_refresh_access_token(max_retries=1) is True
+    
+    assert second.refresh_token == "refresh-1"
+    assert json.loads(token_file.read_text())["refresh_token"] == "refresh-1"
+    
+    first._refresh_timer.cancel()
+    second._refresh_timer.cancel()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _serve_callback(port, timeout=2.0):
+    """Run wait_for_callback in a thread and return it with the dict its result lands in"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(code=wait_for_callback("127.0.0.1", port, timeout)))
+    thread.start()
+    return thread, result
+
+def _send_request(port, path) -> bytes:
+    """Send a browser-style GET to the callback listener and return the response"""
+    deadline = time.monotonic() + 2.0
+    while True:
+        try:
+            conn = socket.create_connection(("127.0.0.1", port), timeout=2.0)
+            break
+        except ConnectionRefusedError:
+            # The listener may not be bound yet
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+    
+    with conn:
+        conn.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        response = b""
+        while chunk := conn.recv(4096):
+            response += chunk
+    return response
+
+def test_wait_for_callback_returns_code():
+    """Test that the authorization code is taken from the redirect and the browser gets a 200"""
+    port = _free_port()
+    thread, result = _serve_callback(port)
+    
+    response = _send_request(port, "/callback?code=abc123&state=xyz")
+    thread.join()
+    
+    assert result["code"] == "abc123"
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert response.endswith(b"Authentication successful! You can close this window.")
+
+def test_wait_for_callback_without_code():
+    """Test that a redirect without a code returns None and the browser gets a 400"""
+    port = _free_port()
+    thread, result = _serve_callback(port)
+    
+    response = _send_request(port, "/callback?error=access_denied")
+    thread.join()
+    
+    assert result["code"] is None
+    assert response.startswith(b"HTTP/1.1 400 Bad Request")
+
+def test_wait_for_callback_times_out():
+    """Test that no redirect within the timeout returns None"""
+    started = time.monotonic()
+    
+    assert wait_for_callback("127.0.0.1", _free_port(), timeout=0.2) is None
+    assert time.monotonic() - started < 2.0
@@ -0,0 +1,74 @@
+"""
+Tests for the backtesting engine
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtesting.backtest import BacktestEngine
+from src.trading.strategies.macd_strategy import MACDStrategy
+
+MACD_PARAMS = {'fast_period': 5, 'slow_period': 13, 'signal_period': 4, 'quantity': 2}
+
+class RecordingMACDStrategy(MACDStrategy):
+    """MACD strategy that remembers the current bar, so its market orders can fill at the close"""
+    
+    __slots__ = ('last_tick',)
+    
+    def on_tick_data(self, data):
+        self.last_tick = dict(data)
+        super().on_tick_data(data)
+
+@pytest.fixture(autouse=True)
+def data_home(tmp_path, monkeypatch):
+    """Keep saved strategy settings out of the real home directory"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+def _random_walk(n_bars: int, seed: int = 7) -> pd.DataFrame:
+    """Daily price bars following a random walk"""
+    rng = np.random.default_rng(seed)
+    closes = 100.0 + np.cumsum(rng.normal(0.0, 1.0, n_bars))
+    return pd.DataFrame({
+        'Date': pd.date_range('2023-01-02', periods=n_bars, freq='D'),
+        'Open': closes,
+        'High': closes + 0.5,
+        'Low': closes - 0.5,
+        'Close': closes,
+        'Volume': np.full(n_bars, 1000)
+    })
+
+def _fill_at_close(engine: BacktestEngine):
+    """Make the engine's market orders fill at the close of the bar they are placed on"""
+    place_market_order = engine.order_manager.place_market_order
+    
+    def place_at_close(instrument, transaction_type, quantity=None, **kwargs):
+        tick = engine.strategy.last_tick
+        return place_market_order(instrument, transaction_type, quantity=quantity,
+                                  price=tick['ltp'], timestamp=tick['timestamp'])
+    
+    engine.order_manager.place_market_order = place_at_close
+
+def test_run_vectorized_matches_event_driven_run():
+    """Test that the vectorized MACD backtest matches the event-driven one bar by bar"""
+    prices = _random_walk(300)
+    
+    event_engine = BacktestEngine(RecordingMACDStrategy, MACD_PARAMS)
+    event_engine.set_price_data(prices.copy(), "TEST")
+    _fill_at_close(event_engine)
+    event_results = event_engine.run()
+    
+    vector_engine = BacktestEngine(MACDStrategy, MACD_PARAMS)
+    vector_engine.set_price_data(prices.copy(), "TEST")
+    vector_results = vector_engine.run_vectorized()
+    
+    event_equity = np.array([point['equity'] for point in event_results['equity_curve']])
+    vector_equity = np.array([point['equity'] for point in vector_results['equity_curve']])
+    assert event_results['num_trades'] > 0
+    assert np.allclose(event_equity, vector_equity)
+    
+    # The event-driven run closes and reopens in two orders where the vectorized
+    # run nets them into one, so compare the resulting positions rather than orders
+    event_position = event_engine.position_tracker.get_position("NSE_EQ_TEST")
+    targets = vector_engine.strategy.generate_signals(prices)
+    assert event_position.quantity == targets[-1]
@@ -3,6 +3,7 @@ Tests for the Instrument model
 """
 
 import pytest
+from dataclasses import FrozenInstanceError
 from src.models.instrument import Instrument
 
 def test_instrument_creation():
@@ -113,4 +114,19 @@ def test_str_representation():
         option_type="CE"
     )
     
-    assert str(option) == "NIFTY 28JUL2022 17500.0 CE (NFO)"
\ No newline at end of file
+    assert str(option) == "NIFTY 28JUL2022 17500.0 CE (NFO)"
+
+def test_instrument_is_immutable():
+    """Test that instruments cannot be modified after creation"""
+    instrument = Instrument(
+        instrument_key="NSE_EQ_RELIANCE",
+        exchange="NSE",
+        symbol="RELIANCE",
+        name="Reliance Industries Limited",
+        instrument_type="EQ"
+    )
+    
+    with pytest.raises(FrozenInstanceError):
+        instrument.symbol = "TCS"
+    
+    assert str(instrument) == "RELIANCE (NSE)"
@@ -0,0 +1,99 @@
+"""
+Tests for the MACD strategy
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.models.instrument import Instrument
+from src.trading.strategies.macd_strategy import MACDStrategy
+from src.trading.strategy import TradingStrategy
+
+N_INSTRUMENTS = 20
+
+class NettingOrderManager:
+    """Order manager that fills market orders immediately into a netted position per instrument"""
+    
+    def __init__(self):
+        self.quantities = {}
+        self.orders = []
+    
+    def place_market_order(self, instrument, transaction_type, quantity=None, **kwargs):
+        key = instrument.instrument_key
+        self.orders.append((key, transaction_type, quantity))
+        self.quantities[key] = self.quantities.get(key, 0) + (quantity if transaction_type == "BUY" else -quantity)
+        return f"ORDER{len(self.orders)}"
+
+class NettedPositionTracker:
+    """Position tracker reading the order manager's netted positions"""
+    
+    def __init__(self, order_manager):
+        self.order_manager = order_manager
+    
+    def get_position(self, instrument_key):
+        return SimpleNamespace(quantity=self.order_manager.quantities.get(instrument_key, 0))
+
+@pytest.fixture(autouse=True)
+def data_home(tmp_path, monkeypatch):
+    """Keep saved strategy settings out of the real home directory"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+class FailingOrderManager(NettingOrderManager):
+    """Order manager whose broker rejects every order for one instrument"""
+    
+    def place_market_order(self, instrument, transaction_type, quantity=None, **kwargs):
+        if instrument.instrument_key == "NSE_EQ_S0":
+            raise RuntimeError("order rejected")
+        return super().place_market_order(instrument, transaction_type, quantity, **kwargs)
+
+def _make_strategy(order_manager_class=NettingOrderManager):
+    order_manager = order_manager_class()
+    strategy = MACDStrategy(None, order_manager, NettedPositionTracker(order_manager))
+    strategy.set_parameters({'fast_period': 3, 'slow_period': 6, 'signal_period': 3, 'quantity': 2})
+    strategy.set_instruments([
+        Instrument(instrument_key=f"NSE_EQ_S{i}", exchange="NSE", symbol=f"S{i}", name=f"S{i}", instrument_type="EQ")
+        for i in range(N_INSTRUMENTS)
+    ])
+    strategy.initialize()
+    return strategy, order_manager
+
+def _orders_by_instrument(orders):
+    by_instrument = {}
+    for key, transaction_type, quantity in orders:
+        by_instrument.setdefault(key, []).append((transaction_type, quantity))
+    return by_instrument
+
+@pytest.mark.parametrize("order_manager_class", [NettingOrderManager, FailingOrderManager])
+def test_tick_batches_match_per_tick_updates(order_manager_class):
+    """Test that vectorized tick batches give the same MACD state and orders as ticks one at a time"""
+    per_tick, per_tick_orders = _make_strategy(order_manager_class)
+    batched, batched_orders = _make_strategy(order_manager_class)
+    
+    rng = np.random.default_rng(3)
+    prices = 100.0 + np.cumsum(rng.normal(0.0, 1.0, (400, N_INSTRUMENTS)), axis=0)
+    used_vectorized_path = False
+    
+    for step in range(len(prices)):
+        # Batches of varying size, so both the per-tick and vectorized batch paths run
+        keys = rng.choice(N_INSTRUMENTS, rng.integers(1, N_INSTRUMENTS + 1), replace=False)
+        batch = [{'instrument_key': f"NSE_EQ_S{k}", 'ltp': float(prices[step, k])} for k in keys]
+        
+        ready = sum(batched.state[data['instrument_key']].ready for data in batch)
+        used_vectorized_path |= ready >= MACDStrategy.BATCH_VECTORIZE_MIN
+        
+        # Ticks one at a time, as the base on_tick_batch delivers them
+        TradingStrategy.on_tick_batch(per_tick, batch)
+        batched.on_tick_batch(batch)
+    
+    assert used_vectorized_path
+    assert np.array_equal(per_tick.fast_ema, batched.fast_ema, equal_nan=True)
+    assert np.array_equal(per_tick.slow_ema, batched.slow_ema, equal_nan=True)
+    assert np.array_equal(per_tick.signal_ema, batched.signal_ema, equal_nan=True)
+    assert np.array_equal(per_tick.macd_line, batched.macd_line, equal_nan=True)
+    assert np.array_equal(per_tick.crossover, batched.crossover)
+    
+    assert len(per_tick_orders.orders) > 0
+    assert _orders_by_instrument(batched_orders.orders) == _orders_by_instrument(per_tick_orders.orders)
+    assert batched_orders.quantities == per_tick_orders.quantities
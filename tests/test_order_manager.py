@@ -0,0 +1,109 @@
+"""
+Tests for the OrderManager
+"""
+
+import json
+import threading
+
+from src.trading.order_manager import OrderManager
+
+class FakeOrderBookClient:
+    """Client whose order book gains one new order on every fetch"""
+    
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def get_order_book(self, raw: bool = False) -> bytes:
+        with self._lock:
+            self.calls += 1
+            count = self.calls
+        records = [{"order_id": f"ORDER{i}", "status": "COMPLETE", "quantity": "1", "filled_quantity": "1"}
+                   for i in range(count)]
+        return json.dumps({"status": "success", "data": records}).encode()
+
+def test_poll_orders_reports_changes_from_concurrent_fetches():
+    """Test that orders changed by fetches on other threads all reach poll_orders"""
+    client = FakeOrderBookClient()
+    manager = OrderManager(client)
+    fetches_per_thread = 50
+    
+    notified = set()
+    notified_lock = threading.Lock()
+    
+    def on_order(order):
+        with notified_lock:
+            notified.add(order.order_id)
+    
+    total_orders = 4 * fetches_per_thread + 101
+    for i in range(total_orders):
+        manager.register_order_callback(f"ORDER{i}", on_order)
+    
+    def fetch_repeatedly():
+        for _ in range(fetches_per_thread):
+            manager.fetch_orders()
+    
+    threads = [threading.Thread(target=fetch_repeatedly) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        manager.poll_orders()
+    for thread in threads:
+        thread.join()
+    
+    # A last poll delivers whatever the fetch threads changed after the loop
+    manager.poll_orders()
+    
+    assert client.calls == total_orders
+    assert notified == {f"ORDER{i}" for i in range(total_orders)}
+
+def test_raising_order_callback_does_not_skip_others():
+    """Test that every callback for an order runs even if an earlier one raises"""
+    manager = OrderManager(FakeOrderBookClient())
+    calls = []
+    
+    def failing(order):
+        calls.append("failing")
+        raise RuntimeError("boom")
+    
+    manager.register_order_callback("ORDER0", failing)
+    manager.register_order_callback("ORDER0", lambda order: calls.append(order.order_id))
+    
+    manager.poll_orders()
+    
+    assert calls == ["failing", "ORDER0"]
+
+class FailingOrderBookClient:
+    """Client whose order book request fails"""
+    
+    def get_order_book(self, raw: bool = False):
+        return {"status": "error", "message": "service unavailable"}
+
+def test_failed_fetch_keeps_refresh_pending():
+    """Test that a failed fetch leaves a requested refresh pending, so get_order fetches again"""
+    client = FailingOrderBookClient()
+    manager = OrderManager(client)
+    manager._refresh_pending.set()
+    
+    assert manager.fetch_orders() == []
+    assert manager._refresh_pending.is_set()
+    
+    # The cache was never refreshed, so a lookup of an unknown order fetches
+    client.get_order_book = lambda raw=False: json.dumps([{"order_id": "NEW", "status": "OPEN"}]).encode()
+    assert manager.get_order("NEW").order_id == "NEW"
+    assert not manager._refresh_pending.is_set()
+
+def test_debounced_refresh_coalesces_and_leaves_no_thread():
+    """Test that a burst of order actions triggers one fetch and no lingering refresh thread"""
+    client = FakeOrderBookClient()
+    manager = OrderManager(client)
+    
+    for _ in range(5):
+        manager._fetch_order_details("ORDER0")
+    timer = manager._refresh_timer
+    timer.join(1.0)
+    
+    assert client.calls == 1
+    assert not timer.is_alive()
+    assert manager._refresh_timer is None
+    assert manager.get_order("ORDER0").order_id == "ORDER0"
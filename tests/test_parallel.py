@@ -0,0 +1,111 @@
+"""
+Tests for parallel backtesting
+"""
+
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.backtesting.parallel as parallel
+from src.backtesting.backtest import BacktestEngine
+from src.backtesting.parallel import BacktestDataStore, BacktestOrchestrator, run_single
+from src.trading.strategy import TradingStrategy
+
+class ThresholdStrategy(TradingStrategy):
+    """Holds one unit while the price is above a threshold, filling at the tick's price"""
+    
+    def initialize(self):
+        self.threshold = float(self.get_parameter('threshold', 100.0))
+        self.long = False
+    
+    def on_tick_data(self, data):
+        above = data['ltp'] > self.threshold
+        if above == self.long:
+            return
+        
+        self.long = above
+        instrument = self.instruments[data['instrument_key']]
+        self.order_manager.place_market_order(instrument, "BUY" if above else "SELL", quantity=1,
+                                              price=data['ltp'], timestamp=data['timestamp'])
+    
+    def on_position_update(self, position):
+        pass
+
+@pytest.fixture
+def price_files(tmp_path):
+    """Two small CSV files of random-walk price bars"""
+    paths = []
+    for seed, symbol in enumerate(("AAA", "BBB")):
+        rng = np.random.default_rng(seed)
+        closes = 100.0 + np.cumsum(rng.normal(0.0, 1.0, 60))
+        path = tmp_path / f"{symbol}.csv"
+        pd.DataFrame({
+            'Date': pd.date_range('2023-01-02', periods=len(closes), freq='D'),
+            'Open': closes,
+            'High': closes + 0.5,
+            'Low': closes - 0.5,
+            'Close': closes,
+            'Volume': np.full(len(closes), 1000)
+        }).to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+def _summary(results):
+    """The parts of backtest results that must match between runs"""
+    return results['num_trades'], [point['equity'] for point in results['equity_curve']]
+
+def test_data_store_unlinks_blocks_on_close(price_files):
+    """Test that the store's shared memory blocks are gone once it is closed"""
+    with BacktestDataStore() as store:
+        assert store.load(price_files[0])
+        names = [name for name, _, _ in store.spec['columns'].values()]
+        assert store.spec['symbol'] == "AAA"
+        
+        # Workers can attach to the blocks while the store is open
+        block = SharedMemory(name=names[0])
+        block.close()
+    
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+def test_run_parallel_matches_serial_runs(price_files):
+    """Test that backtests run in two worker processes match serial runs"""
+    params = {'threshold': 100.0}
+    orchestrator = BacktestOrchestrator(ThresholdStrategy, params, n_workers=2)
+    
+    results = orchestrator.run_parallel(price_files)
+    
+    assert set(results) == set(price_files)
+    for path in price_files:
+        serial = run_single(path, ThresholdStrategy, params)
+        assert serial['num_trades'] > 0
+        assert _summary(results[path]) == _summary(serial)
+
+def test_run_sweep_matches_serial_runs_and_unlinks(price_files, monkeypatch):
+    """Test that a two-worker sweep over shared memory matches serial runs and releases the memory"""
+    specs = []
+    
+    class RecordingStore(BacktestDataStore):
+        def load(self, *args, **kwargs):
+            loaded = super().load(*args, **kwargs)
+            specs.append(self.spec)
+            return loaded
+    
+    monkeypatch.setattr(parallel, "BacktestDataStore", RecordingStore)
+    grid = [{'threshold': 99.0}, {'threshold': 101.0}]
+    orchestrator = BacktestOrchestrator(ThresholdStrategy, n_workers=2)
+    
+    sweep = orchestrator.run_sweep(price_files[0], grid)
+    
+    assert [params for params, _ in sweep] == grid
+    for params, results in sweep:
+        engine = BacktestEngine(ThresholdStrategy, params)
+        engine.load_price_data(price_files[0])
+        assert _summary(results) == _summary(engine.run())
+    
+    for name, _, _ in specs[0]['columns'].values():
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
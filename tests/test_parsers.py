@@ -0,0 +1,92 @@
+"""
+Tests for parsing orders and positions from raw API response bodies
+"""
+
+import json
+
+import pytest
+
+import src.models.order_parser as order_parser
+import src.models.position_parser as position_parser
+from src.models.order_parser import parse_orders_bytes
+from src.models.position_parser import parse_position_records
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = [pytest.param(json.loads, id="json"),
+            pytest.param(orjson.loads if orjson else None, id="orjson",
+                         marks=pytest.mark.skipif(orjson is None, reason="orjson not installed"))]
+
+ORDER_RECORDS = [
+    {"order_id": "ORDER1", "instrument_key": "NSE_EQ_RELIANCE", "exchange": "NSE", "symbol": "RELIANCE",
+     "transaction_type": "BUY", "product": "INTRADAY", "order_type": "LIMIT", "quantity": "10",
+     "status": "OPEN", "price": "1500.0", "filled_quantity": "0"},
+    {"order_id": "ORDER2", "instrument_key": "NSE_EQ_TCS", "exchange": "NSE", "symbol": "TCS",
+     "transaction_type": "SELL", "product": "INTRADAY", "order_type": "MARKET", "quantity": "5",
+     "status": "COMPLETE", "average_price": "3500.5", "filled_quantity": "5"}
+]
+
+POSITION_RECORDS = [
+    {"instrument_key": "NSE_EQ_RELIANCE", "symbol": "RELIANCE", "quantity": "10", "last_price": "1520.0"},
+    {"instrument_key": "NSE_EQ_TCS", "symbol": "TCS", "quantity": "-5", "last_price": "3490.0"}
+]
+
+@pytest.fixture(params=BACKENDS)
+def loads(request, monkeypatch):
+    """Decode response bodies with each JSON backend in turn"""
+    monkeypatch.setattr(order_parser, "_loads", request.param)
+    monkeypatch.setattr(position_parser, "_loads", request.param)
+    return request.param
+
+def _body(payload) -> bytes:
+    return json.dumps(payload).encode()
+
+def test_parse_orders_round_trip(loads):
+    """Test that orders decoded from an order book body keep their fields"""
+    orders = parse_orders_bytes(_body({"status": "success", "data": ORDER_RECORDS}))
+    
+    assert [order.order_id for order in orders] == ["ORDER1", "ORDER2"]
+    assert orders[0].transaction_type == "BUY"
+    assert orders[0].quantity == 10
+    assert orders[0].price == 1500.0
+    assert orders[1].status == "COMPLETE"
+    assert orders[1].filled_quantity == 5
+    assert orders[1].average_price == 3500.5
+    
+    # A bare list of records decodes the same way
+    assert [order.order_id for order in parse_orders_bytes(_body(ORDER_RECORDS))] == ["ORDER1", "ORDER2"]
+
+def test_parse_orders_updates_pooled_orders(loads):
+    """Test that orders already in the pool are updated in place"""
+    pool = {order.order_id: order for order in parse_orders_bytes(_body(ORDER_RECORDS))}
+    filled = dict(ORDER_RECORDS[0], status="COMPLETE", filled_quantity="10")
+    
+    orders = parse_orders_bytes(_body({"status": "success", "data": [filled]}), pool=pool)
+    
+    assert orders[0] is pool["ORDER1"]
+    assert orders[0].status == "COMPLETE"
+    assert orders[0].filled_quantity == 10
+
+def test_parse_orders_rejects_invalid_json(loads):
+    """Test that an invalid body raises ValueError with either backend"""
+    with pytest.raises(ValueError):
+        parse_orders_bytes(b"not json")
+
+def test_parse_position_records_round_trip(loads):
+    """Test that position records are extracted from each response layout"""
+    assert parse_position_records(_body({"status": "success", "data": POSITION_RECORDS})) == POSITION_RECORDS
+    assert parse_position_records(_body(POSITION_RECORDS)) == POSITION_RECORDS
+    assert parse_position_records(_body({"data": {"day_positions": POSITION_RECORDS}})) == POSITION_RECORDS
+    
+    by_key = {record["instrument_key"]: record for record in POSITION_RECORDS}
+    assert parse_position_records(_body({"data": by_key})) == POSITION_RECORDS
+    
+    assert parse_position_records(_body({"data": {}})) == []
+
+def test_parse_position_records_rejects_invalid_json(loads):
+    """Test that an invalid body raises ValueError with either backend"""
+    with pytest.raises(ValueError):
+        parse_position_records(b"{")
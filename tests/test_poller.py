@@ -0,0 +1,111 @@
+"""
+Tests for the shared Poller
+"""
+
+import threading
+import time
+
+from src.trading.poller import Poller
+
+class CountingJob:
+    """Poll job that records when it runs"""
+    
+    def __init__(self):
+        self.runs = []
+        self.ran = threading.Event()
+    
+    def __call__(self):
+        self.runs.append(time.monotonic())
+        self.ran.set()
+
+def _wait_for(condition, timeout=2.0):
+    """Wait until condition() is true or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_jobs_run_on_their_own_intervals():
+    """Test that each job runs at its own interval"""
+    poller = Poller(refresh_interval=10.0)
+    fast = CountingJob()
+    slow = CountingJob()
+    poller.add_job(fast, 0.05)
+    poller.add_job(slow, 0.4)
+    
+    poller.start()
+    try:
+        time.sleep(0.6)
+    finally:
+        poller.stop()
+    
+    assert len(fast.runs) >= 5
+    assert 1 <= len(slow.runs) <= 3
+    assert len(fast.runs) > len(slow.runs)
+
+def test_jobs_added_and_removed_while_running():
+    """Test that jobs can be added and removed while the loop runs"""
+    poller = Poller(refresh_interval=10.0)
+    first = CountingJob()
+    poller.start()
+    try:
+        # A new job runs on the next pass rather than after the loop's sleep
+        poller.add_job(first, 0.02)
+        assert first.ran.wait(1.0)
+        
+        second = CountingJob()
+        poller.add_job(second, 0.02)
+        assert second.ran.wait(1.0)
+        
+        poller.remove_job(first)
+        time.sleep(0.05)
+        runs_after_removal = len(first.runs)
+        time.sleep(0.1)
+        assert len(first.runs) == runs_after_removal
+        
+        # The loop survives the churn and keeps running the remaining job
+        runs = len(second.runs)
+        assert _wait_for(lambda: len(second.runs) > runs)
+    finally:
+        poller.stop()
+
+def test_failing_job_does_not_stop_the_loop():
+    """Test that a job that raises does not stop other jobs from running"""
+    poller = Poller(refresh_interval=10.0)
+    
+    def failing():
+        raise RuntimeError("boom")
+    
+    job = CountingJob()
+    poller.add_job(failing, 0.02)
+    poller.add_job(job, 0.02)
+    poller.start()
+    try:
+        assert _wait_for(lambda: len(job.runs) >= 3)
+    finally:
+        poller.stop()
+
+def test_wake_runs_job_before_its_interval():
+    """Test that waking a job runs it without waiting out its interval"""
+    poller = Poller(refresh_interval=10.0)
+    job = CountingJob()
+    poller.add_job(job, 60.0)
+    poller.start()
+    try:
+        assert job.ran.wait(1.0)
+        job.ran.clear()
+        
+        poller.wake(job)
+        assert job.ran.wait(1.0)
+        assert len(job.runs) == 2
+    finally:
+        poller.stop()
+
+def test_wake_ignores_unknown_job():
+    """Test that waking a job that was never added does nothing"""
+    poller = Poller()
+    poller.wake(CountingJob())
+    
+    assert poller._next_due == {}
@@ -125,4 +125,27 @@ def test_position_properties():
         realized_pnl=120.0
     )
     
-    
\ No newline at end of file
+
+def test_position_uses_slots():
+    """Test that positions store fields in slots rather than an instance dict"""
+    position = Position.from_api_response({"instrument_key": "NSE_EQ_RELIANCE", "quantity": "10"})
+    
+    assert not hasattr(position, "__dict__")
+    
+    position.last_price = 1525.0
+    assert position.last_price == 1525.0
+    
+    with pytest.raises(AttributeError):
+        position.unknown_field = 1
+
+def test_update_from_api_response():
+    """Test updating an existing position in place from API response"""
+    position = Position.from_api_response({"instrument_key": "NSE_EQ_RELIANCE", "quantity": "10", "last_price": "1520.0"})
+    
+    position.update_from_api_response({"instrument_key": "NSE_EQ_RELIANCE", "quantity": "5", "last_price": "1530.0",
+                                       "unrealized_pnl": "50.0", "realized_pnl": "25.0"})
+    
+    assert position.instrument_key == "NSE_EQ_RELIANCE"
+    assert position.quantity == 5
+    assert position.last_price == 1530.0
+    assert position.total_pnl == 75.0
@@ -0,0 +1,86 @@
+"""
+Tests for the TickDispatcher
+"""
+
+import threading
+
+from src.trading.tick_dispatcher import TickDispatcher
+
+class RecordingHandler:
+    """Batch handler that records what it was given"""
+    
+    def __init__(self):
+        self.batches = []
+        self.delivered = threading.Event()
+    
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.delivered.set()
+
+def _tick(instrument_key, ltp, timestamp):
+    return {'instrument_key': instrument_key, 'ltp': ltp, 'timestamp': timestamp}
+
+def test_only_latest_tick_per_instrument_is_delivered():
+    """Test that ticks queued before the worker runs are coalesced to the newest per instrument"""
+    handler = RecordingHandler()
+    dispatcher = TickDispatcher(handler)
+    
+    # Queued before start, so all of them are pending together
+    dispatcher.enqueue(_tick("NSE_EQ_A", 100.0, 1))
+    dispatcher.enqueue(_tick("NSE_EQ_B", 200.0, 1))
+    dispatcher.enqueue(_tick("NSE_EQ_A", 101.0, 2))
+    dispatcher.enqueue(_tick("NSE_EQ_A", 102.0, 3))
+    
+    dispatcher.start()
+    try:
+        assert handler.delivered.wait(1.0)
+    finally:
+        dispatcher.stop()
+    
+    assert len(handler.batches) == 1
+    latest = {data['instrument_key']: data['ltp'] for data in handler.batches[0]}
+    assert latest == {"NSE_EQ_A": 102.0, "NSE_EQ_B": 200.0}
+
+def test_repeated_tick_is_dropped():
+    """Test that a tick with the same timestamp and price as the last one queued is dropped"""
+    handler = RecordingHandler()
+    dispatcher = TickDispatcher(handler)
+    dispatcher.start()
+    try:
+        dispatcher.enqueue(_tick("NSE_EQ_A", 100.0, 1))
+        assert handler.delivered.wait(1.0)
+        handler.delivered.clear()
+        
+        # The same tick again, as from the other feed
+        dispatcher.enqueue(_tick("NSE_EQ_A", 100.0, 1))
+        assert not handler.delivered.wait(0.1)
+        
+        # A new price at the same timestamp is still delivered
+        dispatcher.enqueue(_tick("NSE_EQ_A", 100.5, 1))
+        assert handler.delivered.wait(1.0)
+    finally:
+        dispatcher.stop()
+    
+    assert [[data['ltp'] for data in batch] for batch in handler.batches] == [[100.0], [100.5]]
+
+def test_handler_errors_do_not_stop_delivery():
+    """Test that a handler that raises keeps receiving later batches"""
+    failed = threading.Event()
+    delivered = threading.Event()
+    
+    def failing_handler(batch):
+        if not failed.is_set():
+            failed.set()
+            raise RuntimeError("boom")
+        delivered.set()
+    
+    dispatcher = TickDispatcher(failing_handler)
+    dispatcher.start()
+    try:
+        dispatcher.enqueue(_tick("NSE_EQ_A", 100.0, 1))
+        assert failed.wait(1.0)
+        
+        dispatcher.enqueue(_tick("NSE_EQ_A", 101.0, 2))
+        assert delivered.wait(1.0)
+    finally:
+        dispatcher.stop()